@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -93,11 +94,14 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoise for static files
+    'backends.metrics.MetricsMiddleware',
+    'backends.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backends.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -246,6 +250,74 @@ else:
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Homepage snapshot cache (seconds)
+HOMEPAGE_SNAPSHOT_TIMEOUT = int(os.getenv('HOMEPAGE_SNAPSHOT_TIMEOUT', '3600'))
+HOMEPAGE_SNAPSHOT_MAX_AGE = int(os.getenv('HOMEPAGE_SNAPSHOT_MAX_AGE', '300'))
+HOMEPAGE_SNAPSHOT_STALE_WHILE_REVALIDATE = os.getenv('HOMEPAGE_SNAPSHOT_STALE_WHILE_REVALIDATE', 'True') == 'True'
+
+# Product search: 'auto' picks SQLite FTS5, MySQL FULLTEXT or the in-process index
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
+
+# Responsive image derivatives
+IMAGE_DERIVATIVE_WIDTHS = [int(width) for width in os.getenv('IMAGE_DERIVATIVE_WIDTHS', '320,640,960,1280').split(',')]
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv('IMAGE_DERIVATIVE_QUALITY', '80'))
+IMAGE_DERIVATIVES_ASYNC = os.getenv('IMAGE_DERIVATIVES_ASYNC', 'True') == 'True'
+
+# Cache-Control max-age (seconds) for the catalog JSON endpoints
+CATALOG_JSON_MAX_AGE = int(os.getenv('CATALOG_JSON_MAX_AGE', '60'))
+
+# Per-view SQL query budgets keyed by URL name, e.g. {'backends:cart_items': 8};
+# these override @query_budget. Enforcing raises instead of logging (for tests).
+SQL_QUERY_BUDGETS = json.loads(os.getenv('SQL_QUERY_BUDGETS', '{}'))
+SQL_QUERY_BUDGET_ENFORCE = os.getenv('SQL_QUERY_BUDGET_ENFORCE', 'False') == 'True'
+
+# Bearer token required by /metrics when set
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Request profiling: staff can add ?_profile=1 or an X-Profile header; a sample
+# rate of N also profiles 1 in N requests and keeps the slowest per view
+PROFILING_DIR = os.getenv('PROFILING_DIR', '')
+PROFILING_INTERVAL = float(os.getenv('PROFILING_INTERVAL', '0.005'))
+PROFILING_SAMPLE_RATE = int(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_KEEP_SLOWEST = int(os.getenv('PROFILING_KEEP_SLOWEST', '5'))
+
+# Anonymous carts kept in a signed cookie and merged into the customer's cart at login
+GUEST_CART_ENABLED = os.getenv('GUEST_CART_ENABLED', 'True') == 'True'
+GUEST_CART_MAX_AGE = int(os.getenv('GUEST_CART_MAX_AGE', str(60 * 60 * 24 * 30)))
+
+# Sales tax applied to the discounted cart subtotal (see backends.pricing)
+SALES_TAX_RATE = os.getenv('SALES_TAX_RATE', '0.10')
+
+# Seconds checkout holds stock for an unpaid order before release_stock_reservations returns it
+STOCK_RESERVATION_TTL = int(os.getenv('STOCK_RESERVATION_TTL', '900'))
+
+# Application cache shared by all workers. CACHE_BACKEND is file (the default, shared
+# by the workers on one host), memcached (needs pymemcache), redis (needs redis) or
+# locmem, which is per process and only safe with a single worker: cache versions
+# bumped in one worker would not reach the others. CACHE_LOCATION points at the
+# directory or server, so any memcached/redis-compatible stand-in works.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'luxeprestige'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHE_BACKEND, CACHE_DEFAULT_LOCATION = CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'file')]
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_DEFAULT_LOCATION),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'luxeprestige'),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', '300')),
+    }
+}
+
+# Values each process reserves at a time from a backends.sequences counter (order numbers)
+SEQUENCE_BLOCK_SIZE = int(os.getenv('SEQUENCE_BLOCK_SIZE', '20'))
+
+# Run bulk order-transition follow-ups (points, emails) in a background thread; lost on worker restart
+ORDER_FOLLOWUPS_ASYNC = os.getenv('ORDER_FOLLOWUPS_ASYNC', 'False') == 'True'
+
 # Default primary key
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -18,11 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from backends.metrics import metrics
 from . import views
 
 urlpatterns = [
     path('', views.Home, name='home'),
     path('health/', views.health_check, name='health_check'),
+    path('metrics', metrics, name='metrics'),
     path('admin/', admin.site.urls),
     path('', include('backends.urls')),
 ]
@@ -1,4 +1,5 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from .fulfillment import transition_orders
 from .models import *
 # Register your models here.
 
@@ -11,7 +12,7 @@ admin.site.register(ProductImage)
 admin.site.register(Customer)
 admin.site.register(Cart)
 admin.site.register(CartItem)
-admin.site.register(Order)
+admin.site.register(OrderItem)
 admin.site.register(ProductCategory)
 admin.site.register(Attribute)
 admin.site.register(AttributeValue)
@@ -24,8 +25,37 @@ admin.site.register(CancelledOrder)
 admin.site.register(OrderReturn)
 admin.site.register(Refund)
 admin.site.register(OnlinePaymentRequest)
+admin.site.register(StockReservation)
+admin.site.register(StockShard)
+admin.site.register(Sequence)
 admin.site.register(DiscountCoupon)
 admin.site.register(CustomerSupport)
 admin.site.register(CustomerSupportTicket)
 admin.site.register(ServerCustomerSupportChat)
-admin.site.register(CustomerSupportFeedback)
\ No newline at end of file
+admin.site.register(CustomerSupportFeedback)
+
+
+def _transition_action(status, label):
+    def action(modeladmin, request, queryset):
+        stats = transition_orders(queryset, status)
+        modeladmin.message_user(request, f"{stats['updated']} order(s) marked {label.lower()}.", messages.SUCCESS)
+        if stats['skipped']:
+            modeladmin.message_user(
+                request, f"{stats['skipped']} order(s) skipped: their status cannot move to {label.lower()}.",
+                messages.WARNING,
+            )
+    action.__name__ = f'mark_{status}'
+    return admin.action(description=f'Mark selected orders as {label.lower()}')(action)
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('order_number', 'customer', 'status', 'total_amount', 'points_awarded', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('order_number', 'customer__name', 'customer__email')
+    list_select_related = ('customer',)
+    actions = [
+        _transition_action(status, label)
+        for status, label in Order.STATUS_CHOICES
+        if status != 'pending'
+    ]
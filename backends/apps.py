@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BackendsConfig(AppConfig):
     name = 'backends'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,271 @@
+"""Latency benchmarks for the storefront hot paths.
+
+Each scenario is a request replayed through the Django test client against
+whatever data is in the database (see ``generate_load_data``). Wall time,
+query count and SQL time are recorded per request; results are summarised
+as percentiles and can be compared against a stored baseline.
+"""
+import math
+import platform
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import sequences
+from .models import Customer, Order, Product
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    data: dict = field(default_factory=dict)
+    authenticated: bool = True
+    expected_status: tuple = (200,)
+
+
+class BenchmarkSetupError(Exception):
+    pass
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class QueryTimer:
+    """``execute_wrapper`` that counts queries and sums their wall time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def pick_fixtures(password, iterations):
+    """Choose a customer with a cart and an order, and a well-stocked product."""
+    customer = (
+        Customer.objects.filter(customer__is_active=True, cart__cartitem__isnull=False, order__isnull=False)
+        .select_related('customer')
+        .order_by('id')
+        .first()
+    )
+    if customer is None:
+        raise BenchmarkSetupError('No customer with a cart and an order; run generate_load_data first.')
+    product = (
+        Product.objects.filter(is_active=True, avl_quantity__gte=iterations + 10)
+        .order_by('-total_review', 'id')
+        .first()
+    )
+    if product is None:
+        raise BenchmarkSetupError('No active product with enough stock to benchmark add_to_cart.')
+    return {
+        'user': customer.customer,
+        'password': password,
+        'product': product,
+        'order': Order.objects.filter(customer=customer).order_by('-id').first(),
+    }
+
+
+def build_scenarios(fixtures):
+    user, product, order = fixtures['user'], fixtures['product'], fixtures['order']
+    return [
+        Scenario('home', 'get', reverse('home'), authenticated=False),
+        Scenario('product_details', 'get', reverse('backends:product_details', args=[product.id]), authenticated=False),
+        Scenario('add_to_cart', 'post', reverse('backends:add_to_cart'), {'product_id': product.id, 'quantity': 1}),
+        Scenario('cart_items', 'get', reverse('backends:cart_items')),
+        Scenario('checkout', 'get', reverse('backends:checkout')),
+        Scenario('order_status', 'get', reverse('backends:order_status', args=[order.id])),
+        Scenario(
+            'login', 'post', reverse('backends:login'),
+            {'username': user.username, 'password': fixtures['password']},
+            authenticated=False, expected_status=(302,),
+        ),
+    ]
+
+
+def run_scenario(scenario, user, iterations, warmup):
+    client = Client()
+    if scenario.authenticated:
+        client.force_login(user)
+    request = getattr(client, scenario.method)
+
+    latencies, query_counts, sql_times = [], [], []
+    for index in range(warmup + iterations):
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = request(scenario.path, scenario.data)
+            elapsed = time.perf_counter() - started
+        if response.status_code not in scenario.expected_status:
+            raise BenchmarkSetupError(
+                f'{scenario.name}: expected status {scenario.expected_status}, got {response.status_code}'
+            )
+        if index < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        query_counts.append(timer.count)
+        sql_times.append(timer.seconds * 1000)
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'queries': max(query_counts),
+        'sql_ms': round(statistics.median(sql_times), 3),
+    }
+
+
+def run_benchmarks(iterations=50, warmup=5, password='loadtest', only=None, progress=None):
+    """Run every scenario (or those named in ``only``) and return results.
+
+    All requests run inside one transaction that is rolled back afterwards,
+    so carts and sessions touched by the benchmark are left unchanged.
+    """
+    results = {}
+    with transaction.atomic():
+        fixtures = pick_fixtures(password, warmup + iterations)
+        for scenario in build_scenarios(fixtures):
+            if only and scenario.name not in only:
+                continue
+            results[scenario.name] = run_scenario(scenario, fixtures['user'], iterations, warmup)
+            if progress:
+                progress(scenario.name, results[scenario.name])
+        transaction.set_rollback(True)
+
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'products': Product.objects.count(),
+            'iterations': iterations,
+        },
+        'scenarios': results,
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Return regression messages: slower p95 beyond ``tolerance`` or more queries."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {current['p95_ms']:.1f}ms vs baseline {previous['p95_ms']:.1f}ms"
+            )
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: {current['queries']} queries vs baseline {previous['queries']}")
+    return regressions
+
+
+def legacy_order_number(customer_id, today):
+    """The number ``Order.save`` used to build: one exists() query per earlier order that day."""
+    prefix = f'ORD{today.year}{today.month}{today.day}{customer_id}000'
+    number = 1
+    while Order.objects.filter(order_number=f'{prefix}{number}').exists():
+        number += 1
+    return f'{prefix}{number}'
+
+
+def _time_numbers(count, make_number, insert=None):
+    latencies = []
+    timer = QueryTimer()
+    for _ in range(count):
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            number = make_number()
+            latencies.append((time.perf_counter() - started) * 1000)
+        if insert:
+            insert(number)
+    return {
+        'numbers': count,
+        'mean_ms': round(statistics.fmean(latencies), 4),
+        'last_ms': round(latencies[-1], 4),
+        'queries_per_number': round(timer.count / count, 2),
+    }
+
+
+def benchmark_order_numbers(orders=200, threads=8, per_thread=500, block_size=20):
+    """Compare the legacy exists() loop with the block allocator.
+
+    The legacy loop runs against ``orders`` real orders for one customer on
+    one day (inserted and rolled back), since its cost grows with them.
+    The allocator is then timed alone, and ``threads`` workers with their
+    own allocators draw ``per_thread`` numbers each from one sequence to
+    check that no value is handed out twice.
+    """
+    customer = Customer.objects.order_by('id').first()
+    if customer is None:
+        raise BenchmarkSetupError('No customer to place orders for; run generate_load_data first.')
+    today = timezone.localdate()
+    zero = Decimal('0.00')
+
+    def insert(number):
+        Order.objects.bulk_create([Order(
+            customer=customer, order_number=number, vat=zero, tax=zero, shipping_cost=zero,
+            paid_amount=zero, due_amount=zero, coupon=zero, total_amount=zero,
+        )])
+
+    results = {}
+    with transaction.atomic():
+        results['legacy'] = _time_numbers(orders, lambda: legacy_order_number(customer.id, today), insert)
+        transaction.set_rollback(True)
+
+    name = 'order_number_benchmark'
+    sequences.reserve_block(name, 1)
+    allocator = sequences.BlockAllocator(name, block_size)
+    results['allocator'] = _time_numbers(orders, allocator.next_value)
+
+    drawn = []
+    errors = []
+    drawn_lock = threading.Lock()
+
+    def worker():
+        worker_allocator = sequences.BlockAllocator(name, block_size)
+        try:
+            values = [worker_allocator.next_value() for _ in range(per_thread)]
+            with drawn_lock:
+                drawn.extend(values)
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            sequences.close_block_connection()
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    results['concurrent'] = {
+        'threads': threads,
+        'numbers': len(drawn),
+        'duplicates': len(drawn) - len(set(drawn)),
+        'errors': errors[:5],
+        'numbers_per_second': round(len(drawn) / elapsed) if elapsed else None,
+    }
+    return results
@@ -0,0 +1,82 @@
+"""Cached catalog reads keyed by per-model version counters.
+
+Every model in ``VERSIONED_MODELS`` has a counter in the cache that is
+bumped after any save or delete commits (see ``backends.signals``).
+``cached_queryset`` puts the counters of the models a query depends on
+into its cache key, so a write anywhere in those tables makes old entries
+unreachable and they simply expire. Bulk writes skip the signals; callers
+bump the versions themselves, as the importer does.
+
+Stock changes made with ``UPDATE`` (``backends.stock``) do not bump the
+Product version, so cached reads are not the place to show live stock.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+from .models import Brand, Category, Membership, Product, ProductImage
+
+VERSIONED_MODELS = (Product, Category, Brand, ProductImage, Membership)
+VERSION_KEY_PREFIX = 'model-version'
+QUERYSET_KEY_PREFIX = 'cached-queryset'
+
+
+def version_key(model):
+    return f'{VERSION_KEY_PREFIX}:{model._meta.label_lower}'
+
+
+def get_versions(models):
+    """``{model: version}`` in one cache round trip; missing counters start at 1."""
+    keys = {version_key(model): model for model in models}
+    found = cache.get_many(keys)
+    versions = {}
+    for key, model in keys.items():
+        if key not in found:
+            cache.add(key, 1, None)
+            found[key] = cache.get(key, 1)
+        versions[model] = found[key]
+    return versions
+
+
+def bump_version(model):
+    try:
+        return cache.incr(version_key(model))
+    except ValueError:
+        cache.add(version_key(model), 2, None)
+        return cache.get(version_key(model), 2)
+
+
+def bump_versions(models=VERSIONED_MODELS):
+    """For bulk writers that bypass the model signals."""
+    for model in models:
+        bump_version(model)
+
+
+def model_changed(model):
+    """Bump ``model``'s version once the current transaction commits."""
+    transaction.on_commit(lambda: bump_version(model))
+
+
+def cached_queryset(queryset, depends_on=None, timeout=DEFAULT_TIMEOUT, key=None):
+    """Evaluate ``queryset`` through the cache and return its rows as a list.
+
+    ``depends_on`` lists the versioned models whose writes should invalidate
+    the result; it defaults to the queryset's own model. ``key`` names the
+    entry when the SQL alone is not a stable identity.
+    """
+    depends_on = depends_on or (queryset.model,)
+    versions = get_versions(depends_on)
+    identity = key or str(queryset.query)
+    digest = hashlib.md5(identity.encode(), usedforsecurity=False).hexdigest()
+    version_part = '.'.join(
+        f'{model._meta.model_name}{versions[model]}'
+        for model in sorted(depends_on, key=lambda model: model._meta.label_lower)
+    )
+    cache_key = f'{QUERYSET_KEY_PREFIX}:{digest}:{version_part}'
+    rows = cache.get(cache_key)
+    if rows is None:
+        rows = list(queryset)
+        cache.set(cache_key, rows, timeout)
+    return rows
@@ -0,0 +1,252 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+
+from .models import Cart, CartItem, Product
+
+ZERO = Decimal('0.00')
+MAX_OPERATIONS = 100
+OPERATIONS = ('set', 'add', 'remove')
+
+# While set, item signals leave the totals alone; the caller recomputes them.
+_totals_deferred = ContextVar('cart_totals_deferred', default=False)
+
+
+class CartOperationError(ValueError):
+    def __init__(self, errors):
+        super().__init__('; '.join(error['message'] for error in errors))
+        self.errors = errors
+
+
+@contextmanager
+def deferred_totals():
+    token = _totals_deferred.set(True)
+    try:
+        yield
+    finally:
+        _totals_deferred.reset(token)
+
+
+def apply_cart_change(cart_id, item_delta, unit_delta, subtotal_delta):
+    """Adjust one cart's stored totals by an item write, in a single UPDATE."""
+    Cart.objects.filter(pk=cart_id).update(
+        item_count=F('item_count') + item_delta,
+        unit_count=F('unit_count') + unit_delta,
+        subtotal=F('subtotal') + subtotal_delta,
+        updated_at=Now(),
+    )
+
+
+def clear_cart(cart_id):
+    """Delete every line of a cart and zero its totals in one UPDATE, not one per line."""
+    with deferred_totals():
+        CartItem.objects.filter(cart_id=cart_id).delete()
+    Cart.objects.filter(pk=cart_id).update(item_count=0, unit_count=0, subtotal=0, updated_at=Now())
+
+
+def _unit_price(item, product_id):
+    if CartItem.product.is_cached(item) and item.product.pk == product_id:
+        return item.product.price
+    return Product.objects.filter(pk=product_id).values_list('price', flat=True).first() or ZERO
+
+
+def cart_item_loaded(item):
+    """Remember the stored cart, product and quantity so later writes can diff them."""
+    loaded = item.__dict__
+    if item.pk and all(name in loaded for name in ('cart_id', 'product_id', 'quantity')):
+        item._cart_snapshot = (loaded['cart_id'], loaded['product_id'], loaded['quantity'])
+    else:
+        item._cart_snapshot = None
+
+
+def cart_item_saved(item, created):
+    if _totals_deferred.get():
+        return
+    previous = None if created else getattr(item, '_cart_snapshot', None)
+    # Part of the caller's transaction when there is one; no savepoint needed.
+    with transaction.atomic(savepoint=False):
+        if previous is None:
+            price = _unit_price(item, item.product_id)
+            apply_cart_change(item.cart_id, 1, item.quantity, price * item.quantity)
+        elif previous[:2] != (item.cart_id, item.product_id):
+            old_price = _unit_price(item, previous[1])
+            apply_cart_change(previous[0], -1, -previous[2], -old_price * previous[2])
+            price = _unit_price(item, item.product_id)
+            apply_cart_change(item.cart_id, 1, item.quantity, price * item.quantity)
+        elif previous[2] != item.quantity:
+            delta = item.quantity - previous[2]
+            apply_cart_change(item.cart_id, 0, delta, _unit_price(item, item.product_id) * delta)
+    item._cart_snapshot = (item.cart_id, item.product_id, item.quantity)
+
+
+def cart_item_deleted(item):
+    if _totals_deferred.get():
+        return
+    cart_id, product_id, quantity = getattr(item, '_cart_snapshot', None) or (
+        item.cart_id, item.product_id, item.quantity,
+    )
+    apply_cart_change(cart_id, -1, -quantity, -_unit_price(item, product_id) * quantity)
+
+
+def product_saving(product, update_fields=None):
+    """Read the stored price before a save that may change it."""
+    product._stored_price = None
+    if product._state.adding or (update_fields and 'price' not in update_fields):
+        return
+    product._stored_price = Product.objects.filter(pk=product.pk).values_list('price', flat=True).first()
+
+
+def product_saved(product, created, update_fields=None):
+    """Reprice the carts holding a product whose price changed."""
+    if created or (update_fields and 'price' not in update_fields):
+        return
+    stored = getattr(product, '_stored_price', None)
+    if stored is not None and stored == product.price:
+        return
+    recompute_carts(Cart.objects.filter(cartitem__product_id=product.pk))
+
+
+def recompute_carts(carts=None):
+    """Rebuild stored totals from the cart items in one UPDATE statement.
+
+    ``carts`` is a Cart queryset (all carts when omitted). Returns the
+    number of carts updated.
+    """
+    items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+    money = DecimalField(max_digits=12, decimal_places=2)
+    carts = Cart.objects.all() if carts is None else carts
+    return Cart.objects.filter(pk__in=carts.values('pk')).update(
+        item_count=Coalesce(Subquery(items.annotate(total=Count('pk')).values('total')), 0),
+        unit_count=Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+        subtotal=Coalesce(
+            Subquery(items.annotate(
+                total=Sum(F('quantity') * F('product__price'), output_field=money)
+            ).values('total')),
+            Value(ZERO),
+            output_field=money,
+        ),
+    )
+
+
+def cart_summary(user):
+    """Stored cart totals and the customer's discount for ``user``, in one query.
+
+    Returns None for users without a customer profile or cart.
+    """
+    if not user.is_authenticated:
+        return None
+    return Cart.objects.filter(customer__customer=user).values(
+        'id',
+        'item_count',
+        'unit_count',
+        'subtotal',
+        membership_discount=F('customer__membership__discount_percentage'),
+        points_discount=F('customer__points_discount_percentage'),
+    ).first()
+
+
+def parse_operations(payload):
+    """Validate ``[{"op": "set"|"add"|"remove", "product_id": 1, "quantity": 2}, ...]``."""
+    if not isinstance(payload, list) or not payload:
+        raise CartOperationError([{'index': None, 'message': 'operations must be a non-empty list.'}])
+    if len(payload) > MAX_OPERATIONS:
+        raise CartOperationError([{'index': None, 'message': f'At most {MAX_OPERATIONS} operations per request.'}])
+
+    operations = []
+    errors = []
+    for index, entry in enumerate(payload):
+        if not isinstance(entry, dict) or entry.get('op') not in OPERATIONS:
+            errors.append({'index': index, 'message': f"Operation {index}: op must be one of {', '.join(OPERATIONS)}."})
+            continue
+        try:
+            product_id = int(entry.get('product_id'))
+            quantity = int(entry.get('quantity', 0 if entry['op'] == 'remove' else 1))
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'message': f'Operation {index}: invalid product_id or quantity.'})
+            continue
+        if entry['op'] != 'remove' and quantity < 1:
+            errors.append({'index': index, 'message': f'Operation {index}: quantity must be at least 1.'})
+            continue
+        operations.append((entry['op'], product_id, quantity))
+    if errors:
+        raise CartOperationError(errors)
+    return operations
+
+
+def plan_quantities(current, operations):
+    """Fold operations over ``{product_id: quantity}``; 0 marks a removal."""
+    target = dict(current)
+    for op, product_id, quantity in operations:
+        if op == 'set':
+            target[product_id] = quantity
+        elif op == 'add':
+            target[product_id] = target.get(product_id, 0) + quantity
+        else:
+            target[product_id] = 0
+    return {product_id: quantity for product_id, quantity in target.items() if current.get(product_id) != quantity}
+
+
+def check_stock(changes):
+    """Validate every changed line against stock in one query."""
+    wanted = {product_id: quantity for product_id, quantity in changes.items() if quantity > 0}
+    stock = {
+        product_id: (is_active, available, name)
+        for product_id, is_active, available, name in Product.objects.filter(id__in=wanted).values_list(
+            'id', 'is_active', 'avl_quantity', 'name',
+        )
+    }
+    errors = []
+    for product_id, quantity in wanted.items():
+        if product_id not in stock or not stock[product_id][0]:
+            errors.append({'product_id': product_id, 'message': f'Product {product_id} is unavailable.'})
+        elif quantity > stock[product_id][1]:
+            errors.append({
+                'product_id': product_id,
+                'message': f'Only {stock[product_id][1]} of {stock[product_id][2]} available in stock.',
+            })
+    if errors:
+        raise CartOperationError(errors)
+
+
+def apply_operations(cart, operations):
+    """Apply parsed operations to ``cart`` atomically; all or nothing.
+
+    One read of the cart lines and one stock query, then at most one
+    bulk_update, one bulk_create and one DELETE, and a single totals
+    recompute.
+    """
+    with transaction.atomic():
+        lines = {
+            product_id: (item_id, quantity)
+            for item_id, product_id, quantity in CartItem.objects.select_for_update().filter(cart=cart).values_list(
+                'id', 'product_id', 'quantity',
+            )
+        }
+        changes = plan_quantities({product_id: line[1] for product_id, line in lines.items()}, operations)
+        check_stock(changes)
+
+        now = timezone.now()
+        to_update, to_create, to_delete = [], [], []
+        for product_id, quantity in changes.items():
+            if quantity == 0:
+                if product_id in lines:
+                    to_delete.append(product_id)
+            elif product_id in lines:
+                to_update.append(CartItem(id=lines[product_id][0], quantity=quantity, updated_at=now))
+            else:
+                to_create.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+
+        with deferred_totals():
+            if to_update:
+                CartItem.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+            if to_create:
+                CartItem.objects.bulk_create(to_create)
+            if to_delete:
+                CartItem.objects.filter(cart=cart, product_id__in=to_delete).delete()
+        if changes:
+            recompute_carts(Cart.objects.filter(pk=cart.pk))
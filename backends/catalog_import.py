@@ -0,0 +1,359 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from . import caching, carts, search
+from .homepage import invalidate_homepage_snapshot
+from .models import (
+    Attribute,
+    AttributeValue,
+    Brand,
+    Cart,
+    Category,
+    Product,
+    ProductAttributeValue,
+    ProductImage,
+)
+
+# Feed column -> Product field.
+PRODUCT_COLUMNS = {
+    'name': 'name',
+    'description': 'description',
+    'price': 'price',
+    'weight': 'weight',
+    'stock': 'avl_quantity',
+    'avl_quantity': 'avl_quantity',
+    'delivery_day_min': 'delivery_day_min',
+    'delivery_day_max': 'delivery_day_max',
+    'is_active': 'is_active',
+    'is_featured': 'is_featured',
+    'product_image': 'product_image',
+}
+DECIMAL_FIELDS = {'price', 'weight'}
+INTEGER_FIELDS = {'avl_quantity', 'delivery_day_min', 'delivery_day_max'}
+BOOLEAN_FIELDS = {'is_active', 'is_featured'}
+PRODUCT_DEFAULTS = {
+    'description': '',
+    'weight': Decimal('0.00'),
+    'delivery_day_min': 3,
+    'delivery_day_max': 7,
+}
+SLUG_MAX_LENGTH = Product._meta.get_field('slug').max_length
+BRAND_MAX_LENGTH = Brand._meta.get_field('name').max_length
+CATEGORY_MAX_LENGTH = Category._meta.get_field('name').max_length
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def read_rows(stream, file_format):
+    """Yield ``(line_number, row)`` pairs from a CSV or NDJSON text stream.
+
+    NDJSON rows are yielded as raw strings and decoded by the importer, so
+    a malformed line is reported like any other bad row.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            yield line_number, line
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'y'):
+        return True
+    if text in ('0', 'false', 'no', 'n'):
+        return False
+    raise ImportRowError(f'invalid boolean {value!r}')
+
+
+def _parse_list(value):
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if not _blank(item)]
+    return [item.strip() for item in str(value).split('|') if item.strip()]
+
+
+def _parse_attributes(value):
+    """``{"Color": "Gold"}``, ``[["Color", "Gold"]]`` or ``Color=Gold|Size=M``."""
+    if isinstance(value, dict):
+        pairs = value.items()
+    elif isinstance(value, list):
+        pairs = value
+    else:
+        pairs = []
+        for item in _parse_list(value):
+            if '=' not in item:
+                raise ImportRowError(f'attribute {item!r} must look like name=value')
+            pairs.append(item.split('=', 1))
+    attributes = []
+    for pair in pairs:
+        try:
+            name, attribute_value = pair
+        except (TypeError, ValueError):
+            raise ImportRowError(f'invalid attribute {pair!r}')
+        name, attribute_value = str(name).strip(), str(attribute_value).strip()
+        if name and attribute_value:
+            attributes.append((name, attribute_value))
+    return attributes
+
+
+def clean_row(row):
+    """Validate one feed row and convert it to importer values."""
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except json.JSONDecodeError as e:
+            raise ImportRowError(f'invalid JSON: {e}')
+    if not isinstance(row, dict):
+        raise ImportRowError('row must be an object')
+
+    fields = {}
+    for column, field in PRODUCT_COLUMNS.items():
+        value = row.get(column)
+        if _blank(value):
+            continue
+        if field in BOOLEAN_FIELDS:
+            value = _parse_bool(value)
+        elif field in DECIMAL_FIELDS or field in INTEGER_FIELDS:
+            try:
+                if field in DECIMAL_FIELDS:
+                    value = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+                else:
+                    value = int(value)
+            except (InvalidOperation, TypeError, ValueError):
+                raise ImportRowError(f'invalid {column} {value!r}')
+            if value < 0:
+                raise ImportRowError(f'{column} must not be negative')
+            model_field = Product._meta.get_field(field)
+            if field in DECIMAL_FIELDS and value >= 10 ** (model_field.max_digits - model_field.decimal_places):
+                raise ImportRowError(f'{column} is too large')
+        else:
+            value = str(value).strip()
+            # Checked here so strict-mode databases do not fail the whole batch.
+            max_length = Product._meta.get_field(field).max_length
+            if max_length and len(value) > max_length:
+                raise ImportRowError(f'{column} must be at most {max_length} characters')
+        fields[field] = value
+
+    for required in ('name', 'price'):
+        if required not in fields:
+            raise ImportRowError(f'{required} is required')
+    brand = str(row.get('brand') or '').strip()
+    category = str(row.get('category') or '').strip()
+    if not brand or not category:
+        raise ImportRowError('brand and category are required')
+    if len(brand) > BRAND_MAX_LENGTH:
+        raise ImportRowError(f'brand must be at most {BRAND_MAX_LENGTH} characters')
+    if len(category) > CATEGORY_MAX_LENGTH:
+        raise ImportRowError(f'category must be at most {CATEGORY_MAX_LENGTH} characters')
+
+    slug = str(row.get('slug') or '').strip() or slugify(fields['name'])
+    if not slug or len(slug) > SLUG_MAX_LENGTH:
+        raise ImportRowError(f'slug must be 1-{SLUG_MAX_LENGTH} characters')
+
+    return {
+        'slug': slug,
+        'fields': fields,
+        'brand': brand,
+        'category': category,
+        'images': _parse_list(row['images']) if not _blank(row.get('images')) else [],
+        'attributes': _parse_attributes(row['attributes']) if not _blank(row.get('attributes')) else [],
+    }
+
+
+class CatalogImporter:
+    """Upsert products, images and attribute values from feed rows.
+
+    Rows are buffered into batches; each batch is written in one transaction
+    with a handful of bulk statements. Brand, category and attribute names
+    are resolved through in-memory maps, and missing ones are created.
+    Products are matched on ``slug``; images on ``(product, image)``.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.stats = {'rows': 0, 'products': 0, 'images': 0, 'attributes': 0, 'errors': 0}
+        self.errors = []
+        self.brand_ids = {}
+        for brand_id, name in Brand.objects.order_by('-id').values_list('id', 'name'):
+            self.brand_ids[name.lower()] = brand_id
+        self.category_ids = {}
+        self.category_slugs = {}
+        for category_id, name, slug in Category.objects.order_by('-id').values_list('id', 'name', 'slug'):
+            self.category_ids[name.lower()] = category_id
+            self.category_slugs[slug] = category_id
+        self.attribute_ids = {}
+        for attribute_id, name in Attribute.objects.order_by('-id').values_list('id', 'name'):
+            self.attribute_ids[name.lower()] = attribute_id
+        self.attribute_value_ids = {}
+        for value_id, attribute_id, value in AttributeValue.objects.values_list('id', 'attribute_id', 'value'):
+            self.attribute_value_ids.setdefault((attribute_id, value.lower()), value_id)
+
+    def run(self, rows, on_batch=None):
+        """Import ``(line_number, row)`` pairs; ``on_batch(stats)`` runs after each batch."""
+        batch = []
+        for line_number, row in rows:
+            self.stats['rows'] += 1
+            try:
+                batch.append(clean_row(row))
+            except ImportRowError as e:
+                self._error(line_number, str(e))
+                continue
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch)
+                batch = []
+                if on_batch:
+                    on_batch(self.stats)
+        if batch:
+            self._write_batch(batch)
+            if on_batch:
+                on_batch(self.stats)
+        # Bulk writes bypass the model signals, so refresh the homepage and cached reads here.
+        invalidate_homepage_snapshot()
+        caching.bump_versions((Product, Brand, Category, ProductImage))
+        return self.stats
+
+    def _error(self, line_number, message):
+        self.stats['errors'] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, message))
+
+    def _resolve_brands(self, names):
+        missing = {name.lower(): name for name in names if name.lower() not in self.brand_ids}
+        if missing:
+            Brand.objects.bulk_create([Brand(name=name) for name in missing.values()])
+            for brand_id, name in Brand.objects.filter(name__in=missing.values()).values_list('id', 'name'):
+                self.brand_ids.setdefault(name.lower(), brand_id)
+
+    def _resolve_categories(self, names):
+        missing = {}
+        for name in names:
+            key = name.lower()
+            if key in self.category_ids:
+                continue
+            slug = slugify(name)[:Category._meta.get_field('slug').max_length]
+            if slug in self.category_slugs:
+                self.category_ids[key] = self.category_slugs[slug]
+            else:
+                missing[slug] = name
+        if missing:
+            Category.objects.bulk_create(
+                [Category(name=name, slug=slug) for slug, name in missing.items()], ignore_conflicts=True,
+            )
+            for category_id, slug in Category.objects.filter(slug__in=missing).values_list('id', 'slug'):
+                self.category_slugs[slug] = category_id
+                self.category_ids[missing[slug].lower()] = category_id
+
+    def _resolve_attribute_values(self, pairs):
+        missing_attributes = {name.lower(): name for name, _ in pairs if name.lower() not in self.attribute_ids}
+        if missing_attributes:
+            Attribute.objects.bulk_create([Attribute(name=name) for name in missing_attributes.values()])
+            for attribute_id, name in Attribute.objects.filter(
+                name__in=missing_attributes.values()
+            ).values_list('id', 'name'):
+                self.attribute_ids.setdefault(name.lower(), attribute_id)
+
+        missing_values = {}
+        for name, value in pairs:
+            key = (self.attribute_ids[name.lower()], value.lower())
+            if key not in self.attribute_value_ids:
+                missing_values[key] = value
+        if missing_values:
+            AttributeValue.objects.bulk_create([
+                AttributeValue(attribute_id=attribute_id, value=value)
+                for (attribute_id, _), value in missing_values.items()
+            ])
+            created = AttributeValue.objects.filter(
+                attribute_id__in={attribute_id for attribute_id, _ in missing_values},
+                value__in=missing_values.values(),
+            ).values_list('id', 'attribute_id', 'value')
+            for value_id, attribute_id, value in created:
+                self.attribute_value_ids.setdefault((attribute_id, value.lower()), value_id)
+
+    def _write_batch(self, batch):
+        # The last row wins when a slug repeats inside one batch.
+        by_slug = {item['slug']: item for item in batch}
+        items = list(by_slug.values())
+
+        with transaction.atomic():
+            self._resolve_brands({item['brand'] for item in items})
+            self._resolve_categories({item['category'] for item in items})
+            self._resolve_attribute_values({pair for item in items for pair in item['attributes']})
+
+            # One upsert per set of filled-in columns, so a blank cell never
+            # overwrites an existing product's value with the default.
+            groups = {}
+            for item in items:
+                groups.setdefault(frozenset(item['fields']), []).append(item)
+            products = []
+            for present, group in groups.items():
+                group_products = []
+                for item in group:
+                    values = dict(item['fields'])
+                    for field, default in PRODUCT_DEFAULTS.items():
+                        values.setdefault(field, default)
+                    group_products.append(Product(
+                        slug=item['slug'],
+                        brand_id=self.brand_ids[item['brand'].lower()],
+                        category_id=self.category_ids[item['category'].lower()],
+                        **values,
+                    ))
+                Product.objects.bulk_create(
+                    group_products,
+                    update_conflicts=True,
+                    unique_fields=['slug'],
+                    update_fields=sorted(present | {'brand', 'category', 'updated_at'}),
+                )
+                products.extend(group_products)
+            # Conflicting rows do not get their pk back on every backend.
+            product_ids = dict(Product.objects.filter(slug__in=by_slug).values_list('slug', 'id'))
+
+            images = []
+            links = []
+            for item in items:
+                product_id = product_ids[item['slug']]
+                for position, name in enumerate(dict.fromkeys(item['images'])):
+                    images.append(ProductImage(
+                        product_id=product_id,
+                        image=name,
+                        position=position,
+                        alt_text=item['fields']['name'][:255],
+                    ))
+                for name, value in dict.fromkeys(item['attributes']):
+                    links.append(ProductAttributeValue(
+                        product_id=product_id,
+                        attribute_value_id=self.attribute_value_ids[(self.attribute_ids[name.lower()], value.lower())],
+                    ))
+            if images:
+                ProductImage.objects.bulk_create(
+                    images,
+                    update_conflicts=True,
+                    unique_fields=['product', 'image'],
+                    update_fields=['position', 'alt_text', 'is_active', 'updated_at'],
+                )
+            if links:
+                ProductAttributeValue.objects.bulk_create(links, ignore_conflicts=True)
+
+            # Upserted prices bypass the signal that reprices carts.
+            carts.recompute_carts(Cart.objects.filter(cartitem__product_id__in=product_ids.values()))
+
+        search.index_products(product_ids.values())
+        self.stats['products'] += len(products)
+        self.stats['images'] += len(images)
+        self.stats['attributes'] += len(links)
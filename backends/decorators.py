@@ -0,0 +1,55 @@
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_on_queryset(queryset, max_age=60, public=True):
+    """Answer conditional GETs for a read view from a cheap table validator.
+
+    The validator is ``MAX(updated_at)`` and ``COUNT(*)`` of ``queryset``
+    (a QuerySet, or a callable taking the request). When the client's
+    ETag or Last-Modified still matches, a 304 is returned without calling
+    the view. Every response carries Cache-Control with ``max_age``.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            source = queryset(request) if callable(queryset) else queryset
+            stats = source.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+            last_modified = stats['last_modified']
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            version = int(last_modified.timestamp() * 1000000) if last_modified else 0
+            etag = quote_etag(f"{stats['count']}-{version}")
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response.headers.setdefault('ETag', etag)
+                    if timestamp is not None:
+                        response.headers.setdefault('Last-Modified', http_date(timestamp))
+
+            if public:
+                patch_cache_control(response, public=True, max_age=max_age)
+            else:
+                patch_cache_control(response, private=True, max_age=max_age)
+            return response
+        return wrapper
+    return decorator
+
+
+def query_budget(max_queries):
+    """Declare the most SQL queries a view may run per request.
+
+    Checked by ``QueryBudgetMiddleware``; an entry in ``SQL_QUERY_BUDGETS``
+    for the view's URL name takes precedence.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
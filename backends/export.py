@@ -0,0 +1,102 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .models import Product, ProductImage
+
+# Public field name -> Product lookup used in .values()
+EXPORT_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'slug': 'slug',
+    'price': 'price',
+    'stock': 'avl_quantity',
+    'brand': 'brand__name',
+    'category': 'category__name',
+    'image': 'primary_image',
+}
+DEFAULT_EXPORT_FIELDS = ['id', 'name', 'price', 'stock', 'brand', 'category', 'image']
+EXPORT_BATCH_SIZE = 2000
+
+
+def parse_fields(value):
+    """Validate a comma separated field list; unknown names raise ValueError."""
+    if not value:
+        return list(DEFAULT_EXPORT_FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown export field(s): {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def export_rows(fields, active_only=True, batch_size=EXPORT_BATCH_SIZE):
+    """Yield one dict per product, reading the table in keyset batches.
+
+    Batches are fetched with ``id > last_id`` rather than a single cursor,
+    so memory stays flat on every backend, including MySQL where the
+    client library buffers whole result sets.
+    """
+    queryset = Product.objects.order_by('id')
+    if active_only:
+        queryset = queryset.filter(is_active=True)
+    if 'image' in fields:
+        first_image = ProductImage.objects.filter(
+            product=OuterRef('pk'), is_active=True,
+        ).order_by('position', 'id').values('image')[:1]
+        queryset = queryset.annotate(
+            primary_image=Coalesce(
+                Subquery(first_image), NullIf('product_image', Value('')), output_field=CharField(),
+            ),
+        )
+    lookups = [EXPORT_FIELDS[name] for name in fields]
+
+    last_id = 0
+    while True:
+        # ``id`` is selected first for the keyset, whatever order the caller asked for.
+        batch = list(queryset.filter(id__gt=last_id).values_list('id', *lookups)[:batch_size])
+        if not batch:
+            return
+        for row in batch:
+            item = dict(zip(fields, row[1:]))
+            if 'price' in item:
+                item['price'] = float(item['price'])
+            if 'image' in item:
+                item['image'] = default_storage.url(item['image']) if item['image'] else None
+            yield item
+        last_id = batch[-1][0]
+
+
+def _encode(row):
+    return json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def stream_ndjson(rows, lines_per_chunk=200):
+    chunk = []
+    for row in rows:
+        chunk.append(_encode(row))
+        if len(chunk) >= lines_per_chunk:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def stream_json_array(rows, items_per_chunk=200):
+    yield '['
+    chunk = []
+    first = True
+    for row in rows:
+        chunk.append(_encode(row))
+        if len(chunk) >= items_per_chunk:
+            yield ('' if first else ',') + ','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ('' if first else ',') + ','.join(chunk)
+    yield ']'
@@ -0,0 +1,129 @@
+"""Bulk order status transitions.
+
+``transition_orders`` moves orders to a new status in chunks. Each chunk
+locks the orders whose current status may move to the target
+(``TRANSITIONS``) and changes them with one UPDATE; orders in any other
+state are skipped, so the rule is enforced by the database rather than by
+loading and saving every row. ``Order.save`` is never called.
+
+Stock of cancelled orders, paid or not, is returned in the same
+transaction as the status change, so a cancellation can never commit
+without it. The rest runs per chunk once the chunk commits: points for
+delivered orders (``loyalty.accrue_points``, which skips orders already
+awarded, so ``accrue_loyalty_points`` catches up on any that were missed)
+and one status email per order over a single mail connection. Follow-ups
+run in the request by default; ``ORDER_FOLLOWUPS_ASYNC`` moves them to a
+background thread, where a worker restart can drop them.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import loyalty, stock
+from .models import Order
+from .utls import send_order_status_emails
+
+logger = logging.getLogger(__name__)
+
+# Target status -> statuses an order may move from.
+TRANSITIONS = {
+    'processing': ('pending',),
+    'shipped': ('processing',),
+    'delivered': ('processing', 'shipped'),
+    'cancelled': ('pending', 'processing'),
+}
+
+_background = None
+_background_lock = threading.Lock()
+
+
+class TransitionError(ValueError):
+    pass
+
+
+def _id_chunks(orders, chunk_size):
+    if hasattr(orders, 'values_list'):
+        last_id = 0
+        while True:
+            ids = list(orders.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return
+            last_id = ids[-1]
+            yield ids
+    else:
+        ids = sorted(set(orders))
+        for start in range(0, len(ids), chunk_size):
+            yield ids[start:start + chunk_size]
+
+
+def run_followups(status, order_ids, notify=True):
+    """Batched side effects for orders that just moved to ``status``."""
+    if status == 'delivered':
+        loyalty.accrue_points(order_ids)
+    if notify:
+        rows = Order.objects.filter(id__in=order_ids).values_list(
+            'order_number', 'customer__name', 'customer__email',
+        )
+        send_order_status_emails(dict(Order.STATUS_CHOICES)[status], rows)
+
+
+def _run_in_background(status, order_ids, notify):
+    try:
+        run_followups(status, order_ids, notify)
+    except Exception:
+        logger.exception('Follow-ups failed for %s orders %s', status, order_ids)
+    finally:
+        close_old_connections()
+
+
+def schedule_followups(status, order_ids, notify=True, wait=False):
+    global _background
+    if wait or not getattr(settings, 'ORDER_FOLLOWUPS_ASYNC', False):
+        run_followups(status, order_ids, notify)
+        return
+    with _background_lock:
+        if _background is None:
+            _background = ThreadPoolExecutor(max_workers=1, thread_name_prefix='order-followups')
+    _background.submit(_run_in_background, status, order_ids, notify)
+
+
+def transition_orders(orders, status, chunk_size=1000, notify=True, wait=False, progress=None):
+    """Move ``orders`` (a queryset or ids) to ``status``.
+
+    Returns ``{'updated': n, 'skipped': n}``; skipped orders were in a
+    state that cannot move to ``status``. ``wait`` runs the follow-ups
+    before returning even when ``ORDER_FOLLOWUPS_ASYNC`` is on, as the
+    management command does.
+    """
+    if status not in TRANSITIONS:
+        raise TransitionError(
+            f"Cannot bulk-move orders to {status!r}; choose one of {', '.join(TRANSITIONS)}."
+        )
+    sources = TRANSITIONS[status]
+    stats = {'updated': 0, 'skipped': 0}
+    for chunk in _id_chunks(orders, chunk_size):
+        with transaction.atomic():
+            moved = list(
+                Order.objects.select_for_update()
+                .filter(id__in=chunk, status__in=sources)
+                .values_list('id', flat=True)
+            )
+            if moved:
+                Order.objects.filter(id__in=moved, status__in=sources).update(
+                    status=status, updated_at=timezone.now(),
+                )
+                if status == 'cancelled':
+                    # Paid orders hold committed reservations; cancelling returns those too.
+                    stock.release_orders(moved, include_committed=True)
+                transaction.on_commit(
+                    lambda moved=moved: schedule_followups(status, moved, notify=notify, wait=wait)
+                )
+        stats['updated'] += len(moved)
+        stats['skipped'] += len(chunk) - len(moved)
+        if progress:
+            progress(stats)
+    return stats
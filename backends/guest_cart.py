@@ -0,0 +1,140 @@
+"""Carts for anonymous visitors, kept in a signed cookie.
+
+The cookie holds ``<product id>-<quantity>`` pairs in base 36 separated by
+dots, so a guest cart causes no database writes until the visitor logs in
+and it is merged into their ``Cart``.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.http import base36_to_int, int_to_base36
+
+from .carts import recompute_carts
+from .models import Cart, CartItem, Product
+
+COOKIE_NAME = 'guest_cart'
+COOKIE_SALT = 'backends.guest_cart'
+MAX_LINES = 50
+MAX_QUANTITY = 999
+
+
+@dataclass
+class GuestLine:
+    """Looks enough like a CartItem for the cart template; ``id`` is the product id."""
+    id: int
+    product: Product
+    quantity: int
+    subtotal: Decimal
+
+
+def enabled():
+    return getattr(settings, 'GUEST_CART_ENABLED', True)
+
+
+def encode(lines):
+    return '.'.join(
+        f'{int_to_base36(product_id)}-{int_to_base36(quantity)}'
+        for product_id, quantity in list(lines.items())[:MAX_LINES]
+        if quantity > 0
+    )
+
+
+def decode(value):
+    lines = {}
+    for pair in value.split('.') if value else []:
+        try:
+            product_id, quantity = (base36_to_int(part) for part in pair.split('-', 1))
+        except ValueError:
+            continue
+        if product_id > 0 and quantity > 0:
+            lines[product_id] = min(quantity, MAX_QUANTITY)
+        if len(lines) >= MAX_LINES:
+            break
+    return lines
+
+
+def read(request):
+    """``{product_id: quantity}`` from the request cookie; empty when missing or tampered."""
+    value = request.get_signed_cookie(
+        COOKIE_NAME, default='', salt=COOKIE_SALT, max_age=getattr(settings, 'GUEST_CART_MAX_AGE', None),
+    )
+    return decode(value)
+
+
+def write(response, lines):
+    if not lines:
+        response.delete_cookie(COOKIE_NAME)
+        return
+    response.set_signed_cookie(
+        COOKIE_NAME,
+        encode(lines),
+        salt=COOKIE_SALT,
+        max_age=getattr(settings, 'GUEST_CART_MAX_AGE', 60 * 60 * 24 * 30),
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+def load(lines):
+    """Validate cookie lines against the catalog in one query.
+
+    Unknown, inactive and sold-out products are dropped and quantities are
+    capped at available stock. Returns ``(lines, guest_lines)`` where the
+    first item is the cleaned ``{product_id: quantity}`` mapping.
+    """
+    if not lines:
+        return {}, []
+    products = Product.objects.filter(id__in=lines, is_active=True, avl_quantity__gt=0).select_related(
+        'brand', 'category',
+    )
+    by_id = {product.id: product for product in products}
+    cleaned = {}
+    guest_lines = []
+    for product_id, quantity in lines.items():
+        product = by_id.get(product_id)
+        if product is None:
+            continue
+        quantity = min(quantity, product.avl_quantity)
+        cleaned[product_id] = quantity
+        guest_lines.append(GuestLine(product_id, product, quantity, product.price * quantity))
+    return cleaned, guest_lines
+
+
+def merge_into_cart(customer, lines):
+    """Add guest lines to the customer's cart with one bulk upsert.
+
+    Quantities are added to any existing line for the same product and
+    capped at stock. Returns the number of lines merged.
+    """
+    if not lines:
+        return 0
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(customer=customer)
+        stock = dict(
+            Product.objects.filter(id__in=lines, is_active=True).values_list('id', 'avl_quantity')
+        )
+        existing = dict(
+            CartItem.objects.filter(cart=cart, product_id__in=stock).values_list('product_id', 'quantity')
+        )
+        items = []
+        for product_id, quantity in lines.items():
+            if stock.get(product_id, 0) <= 0:
+                continue
+            items.append(CartItem(
+                cart=cart,
+                product_id=product_id,
+                quantity=min(existing.get(product_id, 0) + quantity, stock[product_id]),
+            ))
+        if items:
+            CartItem.objects.bulk_create(
+                items,
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity', 'updated_at'],
+            )
+            # bulk_create skips the signals that keep the cart totals current.
+            recompute_carts(Cart.objects.filter(pk=cart.pk))
+    return len(items)
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .models import Category, Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CACHE_KEY = 'homepage:snapshot'
+REBUILD_LOCK_KEY = 'homepage:snapshot:rebuilding'
+HOMEPAGE_PRODUCT_LIMIT = 12
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def build_homepage_snapshot():
+    """Build the homepage card list with a fixed number of queries.
+
+    Only the images of the products shown on the page are loaded, so the
+    cost no longer grows with the size of the catalog.
+    """
+    categories = list(Category.objects.filter(is_active=True))
+    products = list(
+        Product.objects.filter(is_active=True)
+        .select_related('category')
+        .order_by('id')[:HOMEPAGE_PRODUCT_LIMIT]
+    )
+
+    image_by_product_id = {}
+    product_images = ProductImage.objects.filter(
+        is_active=True,
+        product_id__in=[product.id for product in products],
+    ).order_by('product_id', 'position', 'id')
+    for image in product_images:
+        if image.product_id not in image_by_product_id:
+            image_by_product_id[image.product_id] = image
+
+    product_cards = []
+    for product in products:
+        product_cards.append({
+            'product': product,
+            'image': image_by_product_id.get(product.id),
+        })
+
+    return {
+        'categories': categories,
+        'category': categories[0] if categories else None,
+        'products': products,
+        'product_images': list(image_by_product_id.values()),
+        'product_cards': product_cards,
+        'built_at': time.time(),
+        'stale': False,
+    }
+
+
+def rebuild_homepage_snapshot():
+    snapshot = build_homepage_snapshot()
+    cache.set(SNAPSHOT_CACHE_KEY, snapshot, _setting('HOMEPAGE_SNAPSHOT_TIMEOUT', 60 * 60))
+    return snapshot
+
+
+def _rebuild_in_background():
+    try:
+        rebuild_homepage_snapshot()
+    except Exception:
+        logger.exception('Homepage snapshot rebuild failed')
+    finally:
+        cache.delete(REBUILD_LOCK_KEY)
+        close_old_connections()
+
+
+def _schedule_rebuild():
+    # cache.add is atomic, so only one worker starts a rebuild at a time.
+    if not cache.add(REBUILD_LOCK_KEY, True, _setting('HOMEPAGE_SNAPSHOT_LOCK_TIMEOUT', 30)):
+        return
+    threading.Thread(target=_rebuild_in_background, daemon=True).start()
+
+
+def get_homepage_snapshot():
+    snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is None:
+        return rebuild_homepage_snapshot()
+
+    if _setting('HOMEPAGE_SNAPSHOT_STALE_WHILE_REVALIDATE', True):
+        max_age = _setting('HOMEPAGE_SNAPSHOT_MAX_AGE', 5 * 60)
+        if snapshot['stale'] or time.time() - snapshot['built_at'] > max_age:
+            _schedule_rebuild()
+    return snapshot
+
+
+def invalidate_homepage_snapshot():
+    """Drop or mark the cached snapshot after a catalog change.
+
+    In stale-while-revalidate mode the old snapshot keeps being served
+    while a single background rebuild refreshes it.
+    """
+    if not _setting('HOMEPAGE_SNAPSHOT_STALE_WHILE_REVALIDATE', True):
+        cache.delete(SNAPSHOT_CACHE_KEY)
+        return
+
+    snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is None:
+        return
+    snapshot['stale'] = True
+    cache.set(SNAPSHOT_CACHE_KEY, snapshot, _setting('HOMEPAGE_SNAPSHOT_TIMEOUT', 60 * 60))
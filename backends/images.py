@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from .imaging import FORMAT_EXTENSIONS, render_variants
+from .models import Category, ImageDerivative, Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_CACHE_TIMEOUT = 60 * 60
+MISSING_CACHE_TIMEOUT = 60
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def _widths():
+    return getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', [320, 640, 960, 1280])
+
+
+def _quality():
+    return getattr(settings, 'IMAGE_DERIVATIVE_QUALITY', 80)
+
+
+def derivative_name(content_hash, width, image_format):
+    return f'derivatives/{content_hash[:2]}/{content_hash}/{width}.{FORMAT_EXTENSIONS[image_format]}'
+
+
+def _cache_key(source_name):
+    return 'image-derivative:' + hashlib.sha1(source_name.encode()).hexdigest()
+
+
+def source_names():
+    """Every image name referenced by products, product images and categories."""
+    querysets = [
+        ProductImage.objects.values_list('image', flat=True),
+        Product.objects.values_list('product_image', flat=True),
+        Category.objects.values_list('category_image', flat=True),
+    ]
+    names = set()
+    for queryset in querysets:
+        names.update(name for name in queryset.iterator(chunk_size=2000) if name)
+    return sorted(names)
+
+
+def _read(name):
+    try:
+        with default_storage.open(name, 'rb') as source:
+            return source.read()
+    except (FileNotFoundError, OSError):
+        logger.warning('Image %s is missing from storage; no derivatives generated', name)
+        return None
+
+
+def _store(content_hash, variants):
+    stored = []
+    for width, image_format, data in variants:
+        name = derivative_name(content_hash, width, image_format)
+        # The path is keyed by content hash, so an existing file is identical.
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(data))
+        stored.append({'width': width, 'format': image_format, 'name': name})
+    return stored
+
+
+def generate_derivatives(names, workers=None, force=False):
+    """Create resized JPEG and WebP variants for the given storage names.
+
+    Images that already have derivatives are skipped, and an image whose
+    content hash matches one processed before reuses those files instead
+    of being decoded again. Rendering runs in a process pool when more than
+    one image needs work. Returns counts per outcome.
+    """
+    names = sorted({name for name in names if name})
+    stats = {'processed': 0, 'reused': 0, 'skipped': 0, 'missing': 0}
+    if not names:
+        return stats
+
+    existing = set()
+    if not force:
+        existing = set(ImageDerivative.objects.filter(source_name__in=names).values_list('source_name', flat=True))
+
+    payloads = {}
+    names_by_hash = {}
+    for name in names:
+        if name in existing:
+            stats['skipped'] += 1
+            continue
+        data = _read(name)
+        if data is None:
+            stats['missing'] += 1
+            continue
+        content_hash = hashlib.sha256(data).hexdigest()
+        payloads[content_hash] = data
+        names_by_hash.setdefault(content_hash, []).append(name)
+
+    results = {}
+    if not force:
+        for derivative in ImageDerivative.objects.filter(content_hash__in=list(names_by_hash)):
+            results[derivative.content_hash] = (derivative.width, derivative.height, derivative.variants)
+        for content_hash in results:
+            stats['reused'] += len(names_by_hash[content_hash])
+
+    to_render = [content_hash for content_hash in names_by_hash if content_hash not in results]
+    widths, quality = _widths(), _quality()
+    if len(to_render) > 1 and workers != 0:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(render_variants, payloads[content_hash], widths, quality=quality): content_hash
+                for content_hash in to_render
+            }
+            for future in as_completed(futures):
+                content_hash = futures[future]
+                try:
+                    width, height, variants = future.result()
+                except Exception:
+                    logger.exception('Failed to render derivatives for %s', names_by_hash[content_hash][0])
+                    continue
+                results[content_hash] = (width, height, _store(content_hash, variants))
+                stats['processed'] += len(names_by_hash[content_hash])
+    else:
+        for content_hash in to_render:
+            try:
+                width, height, variants = render_variants(payloads[content_hash], widths, quality=quality)
+            except Exception:
+                logger.exception('Failed to render derivatives for %s', names_by_hash[content_hash][0])
+                continue
+            results[content_hash] = (width, height, _store(content_hash, variants))
+            stats['processed'] += len(names_by_hash[content_hash])
+
+    records = []
+    for content_hash, (width, height, variants) in results.items():
+        for name in names_by_hash[content_hash]:
+            records.append(ImageDerivative(
+                source_name=name, content_hash=content_hash, width=width, height=height, variants=variants,
+            ))
+    if records:
+        ImageDerivative.objects.bulk_create(
+            records,
+            update_conflicts=True,
+            unique_fields=['source_name'],
+            update_fields=['content_hash', 'width', 'height', 'variants', 'updated_at'],
+        )
+        cache.delete_many([_cache_key(record.source_name) for record in records])
+    return stats
+
+
+def _generate_in_background(names):
+    try:
+        generate_derivatives(names, workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', None))
+    except Exception:
+        logger.exception('Background derivative generation failed for %s', names)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(names):
+    """Generate derivatives for freshly uploaded images off the request path."""
+    global _background
+    names = [name for name in names if name]
+    if not names:
+        return
+    if not getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+        generate_derivatives(names, workers=0)
+        return
+    with _background_lock:
+        if _background is None:
+            _background = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+    _background.submit(_generate_in_background, names)
+
+
+def derivative_for(source_name):
+    """Cached derivative record for an image name, or None."""
+    key = _cache_key(source_name)
+    derivative = cache.get(key)
+    if derivative is None:
+        derivative = ImageDerivative.objects.filter(source_name=source_name).values(
+            'width', 'height', 'variants'
+        ).first()
+        cache.set(key, derivative or False, DERIVATIVE_CACHE_TIMEOUT if derivative else MISSING_CACHE_TIMEOUT)
+    return derivative or None
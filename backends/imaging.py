@@ -0,0 +1,37 @@
+"""Pure image resizing used by the derivative pipeline.
+
+Kept free of Django imports so it can run inside process-pool workers
+without setting up the project.
+"""
+import io
+
+from PIL import Image, ImageOps
+
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def render_variants(data, widths, formats=('webp', 'jpeg'), quality=80):
+    """Resize image bytes to each width and encode them in each format.
+
+    Widths wider than the original are skipped (the original width is used
+    instead when every requested width is too wide), so images are never
+    upscaled. Returns ``(width, height, [(width, format, bytes), ...])``.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        source.load()
+        original_width, original_height = source.size
+
+        targets = sorted({width for width in widths if width < original_width}) or [original_width]
+        variants = []
+        for width in targets:
+            height = max(round(original_height * width / original_width), 1)
+            resized = source if width == original_width else source.resize((width, height), Image.LANCZOS)
+            for image_format in formats:
+                frame = resized
+                if image_format == 'jpeg' and frame.mode not in ('RGB', 'L'):
+                    frame = frame.convert('RGB')
+                buffer = io.BytesIO()
+                frame.save(buffer, format=image_format.upper(), quality=quality, optimize=True)
+                variants.append((width, image_format, buffer.getvalue()))
+    return original_width, original_height, variants
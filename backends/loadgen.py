@@ -0,0 +1,396 @@
+"""Deterministic synthetic data for load testing.
+
+Every row gets an explicit primary key computed from its index, and every
+chunk draws from its own seeded ``random.Random``, so the same seed and
+counts produce the same database regardless of how many worker processes
+did the writing.
+"""
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import caching, carts, ratings, search
+from .homepage import invalidate_homepage_snapshot
+from .models import (
+    Attribute,
+    AttributeValue,
+    Brand,
+    Cart,
+    CartItem,
+    Category,
+    Customer,
+    Inventory,
+    Membership,
+    MenuList,
+    OnlinePaymentRequest,
+    Order,
+    OrderItem,
+    Product,
+    ProductAttributeValue,
+    ProductCategory,
+    ProductImage,
+    Review,
+    UserPermission,
+    Wishlist,
+    WishlistItem,
+)
+
+IMAGES_PER_PRODUCT = 2
+ATTRIBUTES_PER_PRODUCT = 2
+CART_SLOTS = 3
+WISHLIST_SLOTS = 2
+ORDER_ITEM_SLOTS = 3
+VALUES_PER_ATTRIBUTE = 8
+LOAD_PASSWORD = 'loadtest'
+
+ADJECTIVES = [
+    'Aurora', 'Celestial', 'Dusk', 'Echo', 'Frost', 'Gilded', 'Halo', 'Ivory', 'Lumina', 'Mist',
+    'Nocturne', 'Opal', 'Pearl', 'Quartz', 'Sable', 'Solstice', 'Tidal', 'Veil', 'Velvet', 'Zephyr',
+]
+NOUNS = [
+    'Band', 'Bangle', 'Brooch', 'Chain', 'Charm', 'Cuff', 'Drops', 'Hoops', 'Locket', 'Pendant',
+    'Pin', 'Ring', 'Signet', 'Studs', 'Tiara', 'Choker', 'Anklet', 'Bracelet', 'Earcuff', 'Collar',
+]
+ATTRIBUTES = ['Metal', 'Stone', 'Size', 'Finish', 'Length', 'Clasp']
+IMAGE_NAMES = [
+    'product_images/aurora-charm-main.jpg', 'product_images/dusk-chain-main.jpg',
+    'product_images/echo-hoops-main.jpg', 'product_images/frost-signet-main.jpg',
+    'product_images/halo-studs-main.jpg', 'product_images/lumina-drops-main.jpg',
+    'product_images/mist-pin-main.jpg', 'product_images/nocturne-band-main.jpg',
+    'product_images/sable-cuff-main.jpg', 'product_images/solstice-chain-main.jpg',
+    'product_images/veil-pendant-main.jpg',
+]
+ORDER_STATUSES = ['pending', 'processing', 'shipped', 'delivered', 'delivered', 'cancelled']
+
+
+class Plan:
+    """Id ranges for one run: ``bases[model]`` is the first new id."""
+
+    def __init__(self, seed, counts, bases, membership_ids, menu_ids, password_hash, batch_size):
+        self.seed = seed
+        self.counts = counts
+        self.bases = bases
+        self.membership_ids = membership_ids
+        self.menu_ids = menu_ids
+        self.password_hash = password_hash
+        self.batch_size = batch_size
+
+    def id(self, model, index):
+        return self.bases[model] + index
+
+    def rng(self, phase, chunk_start):
+        return random.Random(f'{self.seed}:{phase}:{chunk_start}')
+
+
+def make_plan(seed, products, customers, orders_per_customer, reviews, brands=None, categories=None,
+              staff=5, batch_size=2000):
+    counts = {
+        'brand': brands or max(products // 2000, 5),
+        'category': categories or max(products // 10000, 8),
+        'attribute': len(ATTRIBUTES),
+        'product': products,
+        'customer': customers,
+        'orders_per_customer': orders_per_customer,
+        'review': reviews,
+        'staff': staff,
+    }
+    models = {
+        'brand': Brand, 'category': Category, 'attribute': Attribute, 'attribute_value': AttributeValue,
+        'product': Product, 'product_image': ProductImage, 'product_attribute': ProductAttributeValue,
+        'product_category': ProductCategory, 'inventory': Inventory, 'user': User, 'customer': Customer, 'cart': Cart,
+        'cart_item': CartItem, 'wishlist': Wishlist, 'wishlist_item': WishlistItem, 'order': Order,
+        'order_item': OrderItem, 'payment': OnlinePaymentRequest, 'review': Review, 'permission': UserPermission,
+    }
+    bases = {name: (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1 for name, model in models.items()}
+    return Plan(
+        seed=seed,
+        counts=counts,
+        bases=bases,
+        membership_ids=list(Membership.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)),
+        menu_ids=list(MenuList.objects.filter(is_deleted=False).order_by('id').values_list('id', flat=True)),
+        password_hash=make_password(LOAD_PASSWORD),
+        batch_size=batch_size,
+    )
+
+
+def _name(rng):
+    return f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+
+
+def _money(rng, low, high):
+    return Decimal(rng.randrange(low * 100, high * 100)) / 100
+
+
+def create_lookups(plan):
+    """Brands, categories and attributes; small enough for one process."""
+    rng = plan.rng('lookups', 0)
+    brand_base, category_base = plan.bases['brand'], plan.bases['category']
+    Brand.objects.bulk_create([
+        Brand(id=brand_base + i, name=f'{rng.choice(ADJECTIVES)} House {brand_base + i}')
+        for i in range(plan.counts['brand'])
+    ], batch_size=plan.batch_size)
+    Category.objects.bulk_create([
+        Category(id=category_base + i, name=f'{rng.choice(NOUNS)}s {category_base + i}',
+                 slug=f'load-category-{category_base + i}')
+        for i in range(plan.counts['category'])
+    ], batch_size=plan.batch_size)
+    Attribute.objects.bulk_create([
+        Attribute(id=plan.id('attribute', i), name=name) for i, name in enumerate(ATTRIBUTES)
+    ])
+    AttributeValue.objects.bulk_create([
+        AttributeValue(
+            id=plan.id('attribute_value', i * VALUES_PER_ATTRIBUTE + j),
+            attribute_id=plan.id('attribute', i),
+            value=f'{name} {j + 1}',
+        )
+        for i, name in enumerate(ATTRIBUTES)
+        for j in range(VALUES_PER_ATTRIBUTE)
+    ])
+
+
+def create_products(plan, start, count):
+    rng = plan.rng('products', start)
+    products, images, attributes, categories, inventories = [], [], [], [], []
+    now = timezone.now()
+    value_count = len(ATTRIBUTES) * VALUES_PER_ATTRIBUTE
+    for index in range(start, start + count):
+        product_id = plan.id('product', index)
+        name = _name(rng)
+        delivery_min = rng.randint(1, 5)
+        category_id = plan.id('category', rng.randrange(plan.counts['category']))
+        products.append(Product(
+            id=product_id,
+            name=name,
+            slug=f'load-{product_id}',
+            description=f'{name} in a limited run from the load test catalog.',
+            price=_money(rng, 20, 2000),
+            brand_id=plan.id('brand', rng.randrange(plan.counts['brand'])),
+            category_id=category_id,
+            weight=_money(rng, 1, 80),
+            delivery_day_min=delivery_min,
+            delivery_day_max=delivery_min + rng.randint(1, 7),
+            is_active=rng.random() > 0.05,
+            is_featured=rng.random() < 0.02,
+            avl_quantity=rng.randint(0, 500),
+            product_image=rng.choice(IMAGE_NAMES),
+        ))
+        for position, image in enumerate(rng.sample(IMAGE_NAMES, IMAGES_PER_PRODUCT)):
+            images.append(ProductImage(
+                id=plan.id('product_image', index * IMAGES_PER_PRODUCT + position),
+                product_id=product_id, image=image, position=position, alt_text=name,
+            ))
+        for slot, value_index in enumerate(rng.sample(range(value_count), ATTRIBUTES_PER_PRODUCT)):
+            attributes.append(ProductAttributeValue(
+                id=plan.id('product_attribute', index * ATTRIBUTES_PER_PRODUCT + slot),
+                product_id=product_id, attribute_value_id=plan.id('attribute_value', value_index),
+            ))
+        categories.append(ProductCategory(
+            id=plan.id('product_category', index), product_id=product_id, category_id=category_id,
+        ))
+        stock_quantity = products[-1].avl_quantity
+        inventories.append(Inventory(
+            id=plan.id('inventory', index), product_id=product_id, stock_quantity=stock_quantity,
+            restock_date=now + timedelta(days=rng.randint(1, 30)) if stock_quantity < 20 else None,
+            is_active=products[-1].is_active,
+        ))
+
+    with transaction.atomic():
+        Product.objects.bulk_create(products, batch_size=plan.batch_size)
+        ProductImage.objects.bulk_create(images, batch_size=plan.batch_size)
+        ProductAttributeValue.objects.bulk_create(attributes, batch_size=plan.batch_size)
+        ProductCategory.objects.bulk_create(categories, batch_size=plan.batch_size)
+        Inventory.objects.bulk_create(inventories, batch_size=plan.batch_size)
+    search.index_products(product.id for product in products)
+    return count
+
+
+def create_customers(plan, start, count):
+    rng = plan.rng('customers', start)
+    users, customers, carts, cart_items, wishlists, wishlist_items, orders, order_items, payments = (
+        [] for _ in range(9)
+    )
+    orders_per_customer = plan.counts['orders_per_customer']
+    cart_slots = min(CART_SLOTS, plan.counts['product'])
+    wishlist_slots = min(WISHLIST_SLOTS, plan.counts['product'])
+    for index in range(start, start + count):
+        user_id = plan.id('user', index)
+        customer_id = plan.id('customer', index)
+        users.append(User(
+            id=user_id, username=f'load_user_{user_id}', email=f'load{user_id}@example.test',
+            password=plan.password_hash, first_name=rng.choice(ADJECTIVES),
+        ))
+        customers.append(Customer(
+            id=customer_id, customer_id=user_id, name=f'Load Customer {customer_id}',
+            email=f'load{user_id}@example.test', password=plan.password_hash,
+            phone=f'+1555{rng.randrange(10 ** 7):07d}',
+            membership_id=rng.choice(plan.membership_ids) if plan.membership_ids else None,
+        ))
+        cart_id = plan.id('cart', index)
+        carts.append(Cart(id=cart_id, customer_id=customer_id))
+        for slot, product_index in enumerate(rng.sample(range(plan.counts['product']), cart_slots)):
+            if rng.random() < 0.5:
+                cart_items.append(CartItem(
+                    id=plan.id('cart_item', index * CART_SLOTS + slot), cart_id=cart_id,
+                    product_id=plan.id('product', product_index), quantity=rng.randint(1, 3),
+                ))
+        wishlist_id = plan.id('wishlist', index)
+        wishlists.append(Wishlist(id=wishlist_id, customer_id=customer_id))
+        for slot, product_index in enumerate(rng.sample(range(plan.counts['product']), wishlist_slots)):
+            wishlist_items.append(WishlistItem(
+                id=plan.id('wishlist_item', index * WISHLIST_SLOTS + slot),
+                wishlist_id=wishlist_id, product_id=plan.id('product', product_index),
+            ))
+        for slot in range(orders_per_customer):
+            order_index = index * orders_per_customer + slot
+            order_id = plan.id('order', order_index)
+            subtotal = Decimal('0.00')
+            for line in range(rng.randint(1, ORDER_ITEM_SLOTS)):
+                unit_price = _money(rng, 20, 1500)
+                quantity = rng.randint(1, 3)
+                product_id = plan.id('product', rng.randrange(plan.counts['product'])) if plan.counts['product'] else None
+                order_items.append(OrderItem(
+                    id=plan.id('order_item', order_index * ORDER_ITEM_SLOTS + line), order_id=order_id,
+                    product_id=product_id, product_name=f'Load product {product_id}',
+                    unit_price=unit_price, quantity=quantity, line_total=unit_price * quantity,
+                ))
+                subtotal += unit_price * quantity
+            vat = (subtotal * Decimal('0.05')).quantize(Decimal('0.01'))
+            shipping = Decimal('10.00') if subtotal < 500 else Decimal('0.00')
+            total = subtotal + vat + shipping
+            status = rng.choice(ORDER_STATUSES)
+            paid = total if status != 'pending' else Decimal('0.00')
+            orders.append(Order(
+                id=order_id, customer_id=customer_id, order_number=f'LOAD{order_id:012d}',
+                shipping_address='1 Load Test Way', billing_address='1 Load Test Way',
+                status=status, vat=vat, tax=Decimal('0.00'), shipping_cost=shipping,
+                paid_amount=paid, due_amount=total - paid, coupon=Decimal('0.00'), total_amount=total,
+            ))
+            payments.append(OnlinePaymentRequest(
+                id=plan.id('payment', index * orders_per_customer + slot), order_id=order_id,
+                transaction_id=f'load_txn_{order_id}', amount=total,
+                payment_status='completed' if paid else 'pending', created_by_id=user_id,
+            ))
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=plan.batch_size)
+        Customer.objects.bulk_create(customers, batch_size=plan.batch_size)
+        Cart.objects.bulk_create(carts, batch_size=plan.batch_size)
+        CartItem.objects.bulk_create(cart_items, batch_size=plan.batch_size)
+        Wishlist.objects.bulk_create(wishlists, batch_size=plan.batch_size)
+        WishlistItem.objects.bulk_create(wishlist_items, batch_size=plan.batch_size)
+        Order.objects.bulk_create(orders, batch_size=plan.batch_size)
+        OrderItem.objects.bulk_create(order_items, batch_size=plan.batch_size)
+        OnlinePaymentRequest.objects.bulk_create(payments, batch_size=plan.batch_size)
+    return count
+
+
+def create_reviews(plan, start, count):
+    rng = plan.rng('reviews', start)
+    reviews = [
+        Review(
+            id=plan.id('review', index),
+            customer_id=plan.id('customer', rng.randrange(plan.counts['customer'])),
+            product_id=plan.id('product', rng.randrange(plan.counts['product'])),
+            rating=rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 6, 9])[0],
+            comment=f'{rng.choice(ADJECTIVES)} and {rng.choice(ADJECTIVES).lower()}.',
+        )
+        for index in range(start, start + count)
+    ]
+    Review.objects.bulk_create(reviews, batch_size=plan.batch_size)
+    return count
+
+
+def create_staff(plan):
+    """Staff users with view permission on every menu, for admin page tests."""
+    user_base = plan.id('user', plan.counts['customer'])
+    users = [
+        User(id=user_base + i, username=f'load_staff_{user_base + i}', password=plan.password_hash, is_staff=True)
+        for i in range(plan.counts['staff'])
+    ]
+    permissions = [
+        UserPermission(
+            id=plan.id('permission', i * len(plan.menu_ids) + j), user_id=user.id, menu_id=menu_id,
+            can_view=True, created_by_id=user.id,
+        )
+        for i, user in enumerate(users)
+        for j, menu_id in enumerate(plan.menu_ids)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        UserPermission.objects.bulk_create(permissions, batch_size=plan.batch_size)
+
+
+TASKS = {
+    'products': create_products,
+    'customers': create_customers,
+    'reviews': create_reviews,
+}
+
+
+def _run_task(name, plan, start, count):
+    try:
+        return TASKS[name](plan, start, count)
+    finally:
+        connections.close_all()
+
+
+def run_phase(name, plan, total, chunk_size, workers, progress=None):
+    """Run one phase in chunks, in-process or across a process pool."""
+    chunks = [(start, min(chunk_size, total - start)) for start in range(0, total, chunk_size)]
+    done = 0
+    if workers <= 1 or len(chunks) <= 1:
+        for start, count in chunks:
+            done += TASKS[name](plan, start, count)
+            if progress:
+                progress(name, done, total)
+        return
+
+    # Children must open their own connections rather than inherit ours.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        futures = [pool.submit(_run_task, name, plan, start, count) for start, count in chunks]
+        for future in futures:
+            done += future.result()
+            if progress:
+                progress(name, done, total)
+
+
+def reset_sequences():
+    """Move id sequences past the explicit ids (PostgreSQL and Oracle need this)."""
+    models = [
+        Brand, Category, Attribute, AttributeValue, Product, ProductImage, ProductAttributeValue,
+        ProductCategory, Inventory, User, Customer, Cart, CartItem, Wishlist, WishlistItem, Order,
+        OrderItem, OnlinePaymentRequest, Review, UserPermission,
+    ]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def generate(plan, workers=1, chunk_size=10000, progress=None):
+    if connection.vendor == 'sqlite':
+        # SQLite allows a single writer; extra processes only wait on the lock.
+        workers = 1
+    create_lookups(plan)
+    run_phase('products', plan, plan.counts['product'], chunk_size, workers, progress)
+    run_phase('customers', plan, plan.counts['customer'], chunk_size, workers, progress)
+    if plan.counts['customer'] and plan.counts['product']:
+        run_phase('reviews', plan, plan.counts['review'], chunk_size, workers, progress)
+    create_staff(plan)
+    reset_sequences()
+    # Bulk inserts skip the signals that maintain these aggregates.
+    carts.recompute_carts()
+    ratings.recompute_all(batch_size=plan.batch_size)
+    invalidate_homepage_snapshot()
+    caching.bump_versions()
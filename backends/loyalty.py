@@ -0,0 +1,160 @@
+"""Loyalty points accrual and membership tiers, in batches.
+
+Delivered orders earn 10 points per currency unit paid, rounded down, once
+(``Order.points_awarded`` records it). ``accrue_points`` handles any number
+of orders with a fixed handful of queries per batch: one grouped query sums
+the points per customer, one UPDATE stamps the orders, and the customers'
+points, tier and discount are written back with ``bulk_update``.
+``award_order_points`` is the single-order path used by ``Order.save``.
+"""
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, IntegerField, Sum
+from django.db.models.functions import Cast, Floor, Round
+from django.utils import timezone
+
+from .caching import cached_queryset
+from .models import Customer, Membership, Order
+
+# (minimum points, tier, points discount percentage), sorted by threshold.
+TIERS = (
+    (0, 'bronze', Decimal('0.00')),
+    (10000, 'silver', Decimal('3.00')),
+    (20000, 'gold', Decimal('7.00')),
+    (30000, 'platinum', Decimal('11.00')),
+    (40000, 'diamond', Decimal('15.00')),
+)
+TIER_THRESHOLDS = [threshold for threshold, _, _ in TIERS]
+
+# Whole cents first, so float arithmetic on SQLite cannot round 2.30 * 10 down to 22.
+ORDER_POINTS = Cast(Floor(Round(F('paid_amount') * 100) / 10), IntegerField())
+
+
+def tier_for_points(points):
+    """``(tier, discount_percentage)`` for a points balance."""
+    _, tier, discount = TIERS[max(bisect_right(TIER_THRESHOLDS, points or 0) - 1, 0)]
+    return tier, discount
+
+
+def membership_ids():
+    """``{tier: membership_id}`` for active memberships, cached until a Membership changes."""
+    ids = {}
+    for tier, membership_id in cached_queryset(
+        Membership.objects.filter(is_active=True).order_by('id').values_list('tier', 'id')
+    ):
+        ids.setdefault(tier, membership_id)
+    return ids
+
+
+def _apply_tiers(customers, now):
+    """Set tier membership and discount on loaded customers; returns the changed ones."""
+    memberships = membership_ids()
+    changed = []
+    for customer in customers:
+        tier, discount = tier_for_points(customer.points)
+        membership_id = memberships.get(tier, customer.membership_id)
+        if customer.membership_id != membership_id or customer.points_discount_percentage != discount:
+            customer.membership_id = membership_id
+            customer.points_discount_percentage = discount
+            customer.updated_at = now
+            changed.append(customer)
+    return changed
+
+
+def accrue_points(orders=None, batch_size=1000):
+    """Award points for delivered orders that have not earned any yet.
+
+    ``orders`` is an Order queryset or a list of ids (default: every order).
+    Already-awarded orders are skipped, so running it twice is harmless.
+    Returns ``{'orders': n, 'customers': n, 'points': n}``.
+    """
+    eligible = Order.objects.filter(status='delivered', points_awarded=0, paid_amount__gt=0)
+    if orders is not None:
+        eligible = eligible.filter(pk__in=orders.values('pk') if hasattr(orders, 'values') else list(orders))
+
+    stats = {'orders': 0, 'customers': 0, 'points': 0}
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                eligible.filter(id__gt=last_id).select_for_update().order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return stats
+            last_id = ids[-1]
+            batch = Order.objects.filter(id__in=ids)
+            earned = dict(
+                batch.order_by().values('customer_id').annotate(points=Sum(ORDER_POINTS)).values_list(
+                    'customer_id', 'points',
+                )
+            )
+            batch.update(points_awarded=ORDER_POINTS, updated_at=timezone.now())
+
+            now = timezone.now()
+            customers = list(
+                Customer.objects.select_for_update().filter(id__in=earned).only(
+                    'id', 'points', 'membership_id', 'points_discount_percentage',
+                )
+            )
+            for customer in customers:
+                customer.points = (customer.points or 0) + (earned[customer.id] or 0)
+                customer.updated_at = now
+            _apply_tiers(customers, now)
+            Customer.objects.bulk_update(
+                customers, ['points', 'membership', 'points_discount_percentage', 'updated_at'],
+                batch_size=batch_size,
+            )
+        stats['orders'] += len(ids)
+        stats['customers'] += len(customers)
+        stats['points'] += sum(points or 0 for points in earned.values())
+
+
+def award_order_points(order):
+    """Award points for one delivered order; returns the points awarded (0 if already done).
+
+    The order row is stamped with a conditional UPDATE, so a stale in-memory
+    ``points_awarded`` cannot award twice.
+    """
+    if order.status != 'delivered' or order.points_awarded or (order.paid_amount or 0) <= 0:
+        return 0
+    with transaction.atomic():
+        now = timezone.now()
+        stamped = Order.objects.filter(
+            pk=order.pk, status='delivered', points_awarded=0, paid_amount__gt=0,
+        ).update(points_awarded=ORDER_POINTS, updated_at=now)
+        if not stamped:
+            return 0
+        customer = Customer.objects.select_for_update().only(
+            'id', 'points', 'membership_id', 'points_discount_percentage',
+        ).get(pk=order.customer_id)
+        order.refresh_from_db(fields=['points_awarded', 'updated_at'])
+        customer.points = (customer.points or 0) + order.points_awarded
+        customer.updated_at = now
+        _apply_tiers([customer], now)
+        customer.save(update_fields=['points', 'membership', 'points_discount_percentage', 'updated_at'])
+    # The cached customer still has the old points and tier.
+    if Order.customer.is_cached(order):
+        Order.customer.field.delete_cached_value(order)
+    return order.points_awarded
+
+
+def recompute_tiers(batch_size=1000):
+    """Re-derive every customer's tier and discount from their points; returns how many changed."""
+    changed_total = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            customers = list(
+                Customer.objects.filter(id__gt=last_id).order_by('id').only(
+                    'id', 'points', 'membership_id', 'points_discount_percentage',
+                )[:batch_size]
+            )
+            if not customers:
+                return changed_total
+            last_id = customers[-1].id
+            changed = _apply_tiers(customers, timezone.now())
+            if changed:
+                Customer.objects.bulk_update(changed, ['membership', 'points_discount_percentage', 'updated_at'])
+        changed_total += len(changed)
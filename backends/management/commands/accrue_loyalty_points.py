@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from backends.loyalty import accrue_points, recompute_tiers
+
+
+class Command(BaseCommand):
+    help = 'Award loyalty points for delivered orders that have not earned them yet, and update customer tiers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, nargs='+', metavar='ORDER_ID', help='Only these orders.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--recompute-tiers', action='store_true',
+            help='Also re-derive every customer\'s tier and discount from their points balance.',
+        )
+
+    def handle(self, *args, **options):
+        stats = accrue_points(options['orders'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Awarded {stats['points']} point(s) for {stats['orders']} order(s) to {stats['customers']} customer(s)."
+        ))
+        if options['recompute_tiers']:
+            changed = recompute_tiers(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Updated the tier of {changed} customer(s).'))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backends.benchmarks import BenchmarkSetupError, benchmark_order_numbers
+
+
+class Command(BaseCommand):
+    help = 'Compare the legacy order-number loop with the block allocator and check it under concurrency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help='Orders for one customer in the legacy run.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--per-thread', type=int, default=500)
+        parser.add_argument('--block-size', type=int, default=20)
+        parser.add_argument('--output', help='Write results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        if options['orders'] < 1:
+            raise CommandError('--orders must be at least 1.')
+        try:
+            results = benchmark_order_numbers(
+                orders=options['orders'],
+                threads=options['threads'],
+                per_thread=options['per_thread'],
+                block_size=options['block_size'],
+            )
+        except BenchmarkSetupError as e:
+            raise CommandError(str(e))
+
+        for name in ('legacy', 'allocator'):
+            stats = results[name]
+            self.stdout.write(
+                f"{name:<10} mean {stats['mean_ms']:>8.4f}ms  last {stats['last_ms']:>8.4f}ms  "
+                f"{stats['queries_per_number']:>7.2f} queries/number"
+            )
+        concurrent = results['concurrent']
+        self.stdout.write(
+            f"concurrent {concurrent['threads']} threads  {concurrent['numbers']} numbers  "
+            f"{concurrent['numbers_per_second']}/s  {concurrent['duplicates']} duplicates"
+        )
+        for error in concurrent['errors']:
+            self.stderr.write(error)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if concurrent['duplicates'] or concurrent['errors']:
+            raise CommandError('The allocator handed out duplicate numbers or failed.')
+        self.stdout.write(self.style.SUCCESS('No duplicate numbers.'))
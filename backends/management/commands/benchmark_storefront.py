@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from backends.benchmarks import BenchmarkSetupError, compare, run_benchmarks
+from backends.loadgen import LOAD_PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and SQL cost of the storefront hot paths through the test client.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--password', default=LOAD_PASSWORD, help='Password of the benchmark customer.')
+        parser.add_argument('--only', nargs='+', help='Scenario names to run.')
+        parser.add_argument('--output', help='Write results as JSON to this file.')
+        parser.add_argument('--baseline', help='Compare against a results file from an earlier run.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 slowdown (0.2 = 20%%).')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1.')
+
+        def progress(name, stats):
+            self.stdout.write(
+                f"{name:<16} p50 {stats['p50_ms']:>8.2f}ms  p95 {stats['p95_ms']:>8.2f}ms  "
+                f"p99 {stats['p99_ms']:>8.2f}ms  {stats['queries']:>3} queries  {stats['sql_ms']:>7.2f}ms SQL"
+            )
+
+        # Allows the 'testserver' host and keeps outgoing email in memory.
+        setup_test_environment()
+        try:
+            results = run_benchmarks(
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                password=options['password'],
+                only=options['only'],
+                progress=progress,
+            )
+        except BenchmarkSetupError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+            regressions = compare(results, baseline, tolerance=options['tolerance'])
+            if regressions:
+                for message in regressions:
+                    self.stderr.write(message)
+                raise CommandError(f'{len(regressions)} regression(s) against the baseline.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
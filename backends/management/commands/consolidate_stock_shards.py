@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backends import stock_shards
+from backends.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy sharded stock totals into Product.avl_quantity and Inventory. '
+        'Run it periodically; --enable/--disable switch a product to or from sharded stock.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enable', type=int, metavar='PRODUCT_ID', help='Shard this product\'s stock.')
+        parser.add_argument('--disable', type=int, metavar='PRODUCT_ID', help='Fold this product\'s shards back.')
+        parser.add_argument('--shards', type=int, default=8, help='Shard count for --enable (default 8).')
+
+    def handle(self, *args, **options):
+        for option in ('enable', 'disable'):
+            product_id = options[option]
+            if product_id is not None and not Product.objects.filter(pk=product_id).exists():
+                raise CommandError(f'Product {product_id} does not exist.')
+
+        if options['enable'] is not None:
+            try:
+                stock_shards.enable(options['enable'], options['shards'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"Product {options['enable']} now uses {options['shards']} stock shards.")
+        if options['disable'] is not None:
+            stock_shards.disable(options['disable'])
+            self.stdout.write(f"Product {options['disable']} no longer uses stock shards.")
+
+        updated = stock_shards.consolidate()
+        self.stdout.write(self.style.SUCCESS(f'Consolidated stock for {updated} sharded product(s).'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backends.images import generate_derivatives, source_names
+
+
+class Command(BaseCommand):
+    help = 'Generate resized JPEG/WebP derivatives for existing product and category images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (default: CPU count).')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--force', action='store_true', help='Re-render images that already have derivatives.')
+
+    def handle(self, *args, **options):
+        names = source_names()
+        batch_size = options['batch_size']
+        totals = {'processed': 0, 'reused': 0, 'skipped': 0, 'missing': 0}
+        started = time.monotonic()
+
+        for start in range(0, len(names), batch_size):
+            stats = generate_derivatives(
+                names[start:start + batch_size], workers=options['workers'], force=options['force'],
+            )
+            for key, value in stats.items():
+                totals[key] += value
+            self.stdout.write(f'{min(start + batch_size, len(names))}/{len(names)} images checked')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.1f}s: {totals['processed']} processed, {totals['reused']} reused, "
+            f"{totals['skipped']} already up to date, {totals['missing']} missing."
+        ))
@@ -0,0 +1,58 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backends.loadgen import LOAD_PASSWORD, generate, make_plan
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a deterministic synthetic catalog and inventory, customers, orders and reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--customers', type=int, default=None, help='Default: one per ten products.')
+        parser.add_argument('--orders-per-customer', type=int, default=2)
+        parser.add_argument('--reviews', type=int, default=None, help='Default: one per product.')
+        parser.add_argument('--brands', type=int, default=None)
+        parser.add_argument('--categories', type=int, default=None)
+        parser.add_argument('--staff', type=int, default=5, help='Staff users granted view permission on every menu.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows handled by one worker task.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT statement.')
+
+    def handle(self, *args, **options):
+        products = options['products']
+        customers = options['customers'] if options['customers'] is not None else products // 10
+        reviews = options['reviews'] if options['reviews'] is not None else products
+        if min(products, customers, reviews, options['orders_per_customer']) < 0:
+            raise CommandError('Counts must not be negative.')
+        if customers and not products:
+            raise CommandError('Customers need at least one product for their carts.')
+
+        plan = make_plan(
+            seed=options['seed'],
+            products=products,
+            customers=customers,
+            orders_per_customer=options['orders_per_customer'],
+            reviews=reviews,
+            brands=options['brands'],
+            categories=options['categories'],
+            staff=options['staff'],
+            batch_size=options['batch_size'],
+        )
+        started = time.monotonic()
+
+        def progress(phase, done, total):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{phase}: {done}/{total} ({elapsed:.1f}s)')
+
+        generate(plan, workers=options['workers'], chunk_size=options['chunk_size'], progress=progress)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {products} products, {customers} customers, '
+            f"{customers * options['orders_per_customer']} orders and {reviews} reviews in {elapsed:.1f}s. "
+            f"Generated users log in with the password '{LOAD_PASSWORD}'."
+        ))
@@ -0,0 +1,63 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backends.catalog_import import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert products, images and attribute values from a CSV or NDJSON feed. '
+        'Columns: slug, name, description, price, brand, category, weight, stock, '
+        'delivery_day_min, delivery_day_max, is_active, is_featured, product_image, '
+        'images (a|b) and attributes (Color=Gold|Size=M).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or '-' to read from stdin.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if not file_format:
+            if path.endswith('.csv'):
+                file_format = 'csv'
+            elif path.endswith(('.ndjson', '.jsonl')):
+                file_format = 'ndjson'
+            else:
+                raise CommandError('Cannot tell the feed format from the file name; pass --format.')
+
+        importer = CatalogImporter(batch_size=options['batch_size'])
+        started = time.monotonic()
+
+        def report(stats):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{stats['rows']} rows, {stats['products']} products upserted "
+                f"({stats['rows'] / elapsed if elapsed else 0:.0f} rows/sec)"
+            )
+
+        if path == '-':
+            stats = importer.run(read_rows(sys.stdin, file_format), on_batch=report)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8-sig')
+            except OSError as e:
+                raise CommandError(f'Cannot open {path}: {e}')
+            with stream:
+                stats = importer.run(read_rows(stream, file_format), on_batch=report)
+
+        for line_number, message in importer.errors:
+            self.stderr.write(f'Line {line_number}: {message}')
+        if stats['errors'] > len(importer.errors):
+            self.stderr.write(f"... and {stats['errors'] - len(importer.errors)} more errors")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['rows'] - stats['errors']} of {stats['rows']} rows in {elapsed:.1f}s "
+            f"({stats['rows'] / elapsed if elapsed else 0:.0f} rows/sec): {stats['products']} products, "
+            f"{stats['images']} images, {stats['attributes']} attribute values, {stats['errors']} errors."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backends.ratings import recompute_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Product.rating_sum, total_review and average_rating from the reviews table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = recompute_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated rating aggregates for {updated} product(s).'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backends.fulfillment import TRANSITIONS, TransitionError, transition_orders
+from backends.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Move orders to a new status in bulk, then run the points, stock and email follow-ups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('status', choices=sorted(TRANSITIONS))
+        parser.add_argument('--orders', type=int, nargs='+', metavar='ORDER_ID', help='Order ids to move.')
+        parser.add_argument('--order-numbers-file', help='File with one order number per line, e.g. a carrier feed.')
+        parser.add_argument('--from-status', help='Move every order currently in this status.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--no-notify', action='store_true', help='Do not email customers.')
+
+    def handle(self, *args, **options):
+        if options['order_numbers_file']:
+            try:
+                with open(options['order_numbers_file']) as feed:
+                    numbers = [line.strip() for line in feed if line.strip()]
+            except OSError as e:
+                raise CommandError(f"Cannot read {options['order_numbers_file']}: {e}")
+            orders = []
+            for start in range(0, len(numbers), options['chunk_size']):
+                batch = numbers[start:start + options['chunk_size']]
+                orders.extend(Order.objects.filter(order_number__in=batch).values_list('id', flat=True))
+            if len(orders) < len(set(numbers)):
+                self.stderr.write(f'{len(set(numbers)) - len(orders)} order number(s) not found.')
+        elif options['orders']:
+            orders = options['orders']
+        elif options['from_status']:
+            orders = Order.objects.filter(status=options['from_status'])
+        else:
+            raise CommandError('Give --orders, --order-numbers-file or --from-status.')
+
+        def progress(stats):
+            self.stdout.write(f"{stats['updated']} moved, {stats['skipped']} skipped")
+
+        try:
+            stats = transition_orders(
+                orders, options['status'], chunk_size=options['chunk_size'],
+                notify=not options['no_notify'], wait=True, progress=progress,
+            )
+        except TransitionError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {stats['updated']} order(s) to {options['status']}; skipped {stats['skipped']}."
+        ))
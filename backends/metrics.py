@@ -0,0 +1,99 @@
+"""Prometheus metrics for the storefront.
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set (see ``gunicorn.conf.py``) every
+worker writes its samples to memory-mapped files in that directory and
+``/metrics`` aggregates them, so any worker can answer a scrape.
+"""
+import hmac
+import os
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    'django_http_request_duration_seconds', 'Request latency by URL name.',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    'django_http_requests', 'Responses by URL name and status code.', ['view', 'method', 'status'],
+)
+IN_PROGRESS = Gauge(
+    'django_http_requests_in_progress', 'Requests currently being handled.', multiprocess_mode='livesum',
+)
+DB_QUERIES = Histogram(
+    'django_db_queries_per_request', 'SQL queries run per request.',
+    ['view'], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+DB_DURATION = Histogram(
+    'django_db_duration_seconds', 'Total SQL time per request.', ['view'], buckets=LATENCY_BUCKETS,
+)
+STRIPE_LATENCY = Histogram(
+    'stripe_request_duration_seconds', 'Stripe API call latency.', ['operation'], buckets=LATENCY_BUCKETS,
+)
+EMAIL_LATENCY = Histogram(
+    'email_send_duration_seconds', 'Outgoing email send latency.', ['kind'], buckets=LATENCY_BUCKETS,
+)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else '<unresolved>'
+
+
+class MetricsMiddleware:
+    """Request latency, status and in-flight counts per URL name.
+
+    Place it before ``QueryBudgetMiddleware``; the SQL figures that
+    middleware already collects are reused instead of wrapping the
+    connections a second time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            IN_PROGRESS.dec()
+        elapsed = time.perf_counter() - started
+
+        view = _view_name(request)
+        REQUEST_LATENCY.labels(view, request.method).observe(elapsed)
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        collector = getattr(request, '_query_collector', None)
+        if collector is not None:
+            DB_QUERIES.labels(view).observe(collector.count)
+            DB_DURATION.labels(view).observe(collector.seconds)
+        return response
+
+
+def metrics(request):
+    """Prometheus text exposition; requires ``METRICS_TOKEN`` as a bearer token when set."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponseForbidden()
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,120 @@
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('backends.sql')
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalize(sql):
+    """Statement shape: whitespace squeezed and ``IN (%s, %s, ...)`` lists collapsed."""
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('IN (...)', sql)).strip()
+
+
+class QueryCollector:
+    """``execute_wrapper`` recording count, time and statement texts.
+
+    Statements are only normalized in ``duplicates()``, once per distinct
+    text, so the per-query cost is a dict increment.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    def duplicates(self):
+        shapes = {}
+        for sql, count in self.statements.items():
+            shape = normalize(sql)
+            shapes[shape] = shapes.get(shape, 0) + count
+        return [{'count': count, 'sql': shape[:200]} for shape, count in shapes.items() if count > 1]
+
+
+def budget_for(request):
+    """Query allowance of the resolved view: ``@query_budget`` or ``SQL_QUERY_BUDGETS``."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    budgets = getattr(settings, 'SQL_QUERY_BUDGETS', {})
+    if match.view_name in budgets:
+        return budgets[match.view_name]
+    return getattr(match.func, 'query_budget', None)
+
+
+class QueryBudgetMiddleware:
+    """Record SQL cost per request and check it against the view's budget.
+
+    Adds a ``Server-Timing`` header (``db`` and ``app``) and logs one JSON
+    line per request to the ``backends.sql`` logger: DEBUG normally,
+    WARNING when the budget is exceeded or a statement repeats. With
+    ``SQL_QUERY_BUDGET_ENFORCE`` (meant for tests) an exceeded budget
+    raises ``QueryBudgetExceeded`` instead.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        request._query_collector = collector
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        budget = budget_for(request)
+        duplicates = collector.duplicates()
+        over_budget = budget is not None and collector.count > budget
+
+        timing = (
+            f'db;dur={collector.seconds * 1000:.1f};desc="{collector.count} queries", '
+            f'app;dur={elapsed * 1000:.1f}'
+        )
+        existing = response.headers.get('Server-Timing')
+        response.headers['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        payload = {
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': collector.count,
+            'sql_ms': round(collector.seconds * 1000, 2),
+            'duration_ms': round(elapsed * 1000, 2),
+            'budget': budget,
+            'duplicates': duplicates,
+        }
+        level = logging.WARNING if over_budget or duplicates else logging.DEBUG
+        logger.log(level, json.dumps(payload))
+
+        if over_budget and getattr(settings, 'SQL_QUERY_BUDGET_ENFORCE', False):
+            raise QueryBudgetExceeded(
+                f'{view_name} ran {collector.count} queries, over its budget of {budget}'
+                + (f"; repeated: {', '.join(d['sql'][:80] for d in duplicates)}" if duplicates else '')
+            )
+        return response
@@ -0,0 +1,128 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SQLITE_FTS = [
+    """
+    CREATE VIRTUAL TABLE product_search_fts USING fts5(
+        name, description, brand_name, category_name,
+        content='product_search_documents', content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER product_search_documents_ai AFTER INSERT ON product_search_documents BEGIN
+        INSERT INTO product_search_fts(rowid, name, description, brand_name, category_name)
+        VALUES (new.product_id, new.name, new.description, new.brand_name, new.category_name);
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_documents_ad AFTER DELETE ON product_search_documents BEGIN
+        INSERT INTO product_search_fts(product_search_fts, rowid, name, description, brand_name, category_name)
+        VALUES ('delete', old.product_id, old.name, old.description, old.brand_name, old.category_name);
+    END
+    """,
+    """
+    CREATE TRIGGER product_search_documents_au AFTER UPDATE ON product_search_documents BEGIN
+        INSERT INTO product_search_fts(product_search_fts, rowid, name, description, brand_name, category_name)
+        VALUES ('delete', old.product_id, old.name, old.description, old.brand_name, old.category_name);
+        INSERT INTO product_search_fts(rowid, name, description, brand_name, category_name)
+        VALUES (new.product_id, new.name, new.description, new.brand_name, new.category_name);
+    END
+    """,
+]
+
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS product_search_documents_au',
+    'DROP TRIGGER IF EXISTS product_search_documents_ad',
+    'DROP TRIGGER IF EXISTS product_search_documents_ai',
+    'DROP TABLE IF EXISTS product_search_fts',
+]
+
+MYSQL_FULLTEXT = [
+    'ALTER TABLE product_search_documents ADD FULLTEXT INDEX product_search_fulltext '
+    '(name, description, brand_name, category_name)',
+]
+
+MYSQL_FULLTEXT_DROP = [
+    'ALTER TABLE product_search_documents DROP INDEX product_search_fulltext',
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            if 'ENABLE_FTS5' not in {row[0] for row in cursor.fetchall()}:
+                # Without FTS5 the search module uses its in-process index.
+                return
+        statements = SQLITE_FTS
+    elif vendor == 'mysql':
+        statements = MYSQL_FULLTEXT
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = SQLITE_FTS_DROP
+    elif vendor == 'mysql':
+        statements = MYSQL_FULLTEXT_DROP
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def populate_search_documents(apps, schema_editor):
+    Product = apps.get_model('backends', 'Product')
+    ProductSearchDocument = apps.get_model('backends', 'ProductSearchDocument')
+
+    batch = []
+    for product in Product.objects.select_related('brand', 'category').iterator(chunk_size=1000):
+        batch.append(ProductSearchDocument(
+            product_id=product.id,
+            name=product.name,
+            description=product.description or '',
+            brand_name=product.brand.name,
+            category_name=product.category.name,
+        ))
+        if len(batch) >= 1000:
+            ProductSearchDocument.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProductSearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backends', '0013_customer_dob_customer_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='backends.product')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('brand_name', models.CharField(blank=True, max_length=100)),
+                ('category_name', models.CharField(blank=True, max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Product Search Document',
+                'verbose_name_plural': 'Product Search Documents',
+                'db_table': 'product_search_documents',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:01
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models.functions import Round
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('backends', 'Product')
+    Review = apps.get_model('backends', 'Review')
+
+    # Seed the sum from the stored average so existing listings keep their
+    # numbers, then replace it with real aggregates where reviews exist.
+    Product.objects.update(
+        rating_sum=Round(models.F('average_rating') * models.F('total_review'))
+    )
+
+    totals = Review.objects.values('product_id').annotate(
+        rating_sum=models.Sum('rating'), total=models.Count('id')
+    ).order_by()
+    products = []
+    for row in totals:
+        average = (Decimal(row['rating_sum']) / row['total']).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        products.append(Product(
+            id=row['product_id'],
+            rating_sum=row['rating_sum'],
+            total_review=row['total'],
+            average_rating=average,
+        ))
+    Product.objects.bulk_update(products, ['rating_sum', 'total_review', 'average_rating'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backends', '0014_product_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-average_rating', 'id'], name='products_rating_idx'),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
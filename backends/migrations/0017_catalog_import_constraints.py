@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+def remove_duplicate_links(apps, schema_editor):
+    # Keep the oldest row of every duplicate pair so the constraints apply.
+    for model_name, fields in (
+        ('ProductImage', ('product_id', 'image')),
+        ('ProductAttributeValue', ('product_id', 'attribute_value_id')),
+    ):
+        model = apps.get_model('backends', model_name)
+        keep = model.objects.values(*fields).order_by().annotate(keep_id=models.Min('id')).values_list('keep_id', flat=True)
+        model.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backends', '0016_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_links, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productattributevalue',
+            constraint=models.UniqueConstraint(fields=('product', 'attribute_value'), name='unique_product_attribute_value'),
+        ),
+        migrations.AddConstraint(
+            model_name='productimage',
+            constraint=models.UniqueConstraint(fields=('product', 'image'), name='unique_product_image'),
+        ),
+    ]
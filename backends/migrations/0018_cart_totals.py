@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:14
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def populate_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('backends', 'Cart')
+    CartItem = apps.get_model('backends', 'CartItem')
+
+    items = CartItem.objects.filter(cart=models.OuterRef('pk')).order_by().values('cart')
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+    Cart.objects.update(
+        item_count=Coalesce(models.Subquery(items.annotate(total=models.Count('pk')).values('total')), 0),
+        unit_count=Coalesce(models.Subquery(items.annotate(total=models.Sum('quantity')).values('total')), 0),
+        subtotal=Coalesce(
+            models.Subquery(items.annotate(
+                total=models.Sum(models.F('quantity') * models.F('product__price'), output_field=money)
+            ).values('total')),
+            models.Value(Decimal('0.00')),
+            output_field=money,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backends', '0017_catalog_import_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='unit_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_cart_totals, migrations.RunPython.noop),
+    ]
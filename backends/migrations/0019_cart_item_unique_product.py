@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    Cart = apps.get_model('backends', 'Cart')
+    CartItem = apps.get_model('backends', 'CartItem')
+
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id').order_by()
+        .annotate(rows=models.Count('id'), keep_id=models.Min('id'), quantity=models.Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        lines = CartItem.objects.filter(cart_id=row['cart_id'], product_id=row['product_id'])
+        lines.filter(id=row['keep_id']).update(quantity=row['quantity'])
+        lines.exclude(id=row['keep_id']).delete()
+        Cart.objects.filter(id=row['cart_id']).update(item_count=models.F('item_count') - (row['rows'] - 1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backends', '0018_cart_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+def create_order_number_sequence(apps, schema_editor):
+    # Created up front so concurrent first allocations never race to insert it.
+    apps.get_model('backends', 'Sequence').objects.get_or_create(name='order_number', defaults={'value': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backends', '0021_stock_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequence',
+                'verbose_name_plural': 'Sequences',
+                'db_table': 'sequences',
+            },
+        ),
+        migrations.RunPython(create_order_number_sequence, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,5 @@
 from datetime import datetime, timedelta, timezone
-from decimal import Decimal, ROUND_DOWN
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 # Create your models here.
 
@@ -49,12 +48,15 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     weight = models.DecimalField(max_digits=10, decimal_places=2)
     total_review = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
     delivery_day_min = models.IntegerField()
     delivery_day_max = models.IntegerField()
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
     avl_quantity = models.IntegerField(default=0)
+    # Non-zero when stock lives in that many StockShard rows (see backends.stock_shards)
+    stock_shard_count = models.PositiveSmallIntegerField(default=0)
     product_image = models.ImageField(upload_to='product_images/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -68,6 +70,9 @@ class Product(models.Model):
         db_table = 'products'
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
+        indexes = [
+            models.Index(fields=['-average_rating', 'id'], name='products_rating_idx'),
+        ]
     
 
 class ProductImage(models.Model):
@@ -89,8 +94,50 @@ class ProductImage(models.Model):
         ordering = ['position']
         verbose_name = 'Product Image'
         verbose_name_plural = 'Product Images'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'image'], name='unique_product_image')
+        ]
+    
+
+class ImageDerivative(models.Model):
+    source_name = models.CharField(max_length=255, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    width = models.IntegerField()
+    height = models.IntegerField()
+    variants = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    def __str__(self):
+        return f"Derivatives for {self.source_name}"
+    
+
+    class Meta:
+        db_table = 'image_derivatives'
+        verbose_name = 'Image Derivative'
+        verbose_name_plural = 'Image Derivatives'
+
+
+class ProductSearchDocument(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    brand_name = models.CharField(max_length=100, blank=True)
+    category_name = models.CharField(max_length=50, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    def __str__(self):
+        return f"Search document for {self.name}"
     
 
+    class Meta:
+        db_table = 'product_search_documents'
+        verbose_name = 'Product Search Document'
+        verbose_name_plural = 'Product Search Documents'
+
+
 class ProductCategory(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
@@ -152,6 +199,9 @@ class ProductAttributeValue(models.Model):
         db_table = 'product_attribute_values'
         verbose_name = 'Product Attribute Value'
         verbose_name_plural = 'Product Attribute Values'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'attribute_value'], name='unique_product_attribute_value')
+        ]
 
 
 class Membership(models.Model):
@@ -211,15 +261,8 @@ class Customer(models.Model):
         verbose_name_plural = 'Customers'
 
     def get_tier_from_points(self):
-        if self.points >= 40000:
-            return 'diamond', Decimal('15.00')
-        if self.points >= 30000:
-            return 'platinum', Decimal('11.00')
-        if self.points >= 20000:
-            return 'gold', Decimal('7.00')
-        if self.points >= 10000:
-            return 'silver', Decimal('3.00')
-        return 'bronze', Decimal('0.00')
+        from .loyalty import tier_for_points
+        return tier_for_points(self.points)
 
 
 class Review(models.Model):
@@ -235,6 +278,13 @@ class Review(models.Model):
         return f"Review for {self.product.name} - {self.rating} stars"
     
 
+    def save(self, *args, **kwargs):
+        # Keep the product's rating aggregates (see backends.ratings) in the
+        # same transaction as the review write.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+    
+
     class Meta:
         db_table = 'reviews'
         verbose_name = 'Review'
@@ -347,6 +397,9 @@ class WishlistItem(models.Model):
 
 class Cart(models.Model):
     customer = models.OneToOneField(Customer, on_delete=models.CASCADE)
+    item_count = models.IntegerField(default=0)
+    unit_count = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -377,6 +430,9 @@ class CartItem(models.Model):
         db_table = 'cart_items'
         verbose_name = 'Cart Item'
         verbose_name_plural = 'Cart Items'
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product')
+        ]
 
 
 class Order(models.Model):
@@ -413,60 +469,118 @@ class Order(models.Model):
         db_table = 'orders'
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
+        indexes = [
+            # Order history: one customer's orders, newest first, walked by cursor.
+            models.Index(fields=['customer', '-created_at', '-id'], name='orders_customer_recent_idx'),
+        ]
 
-    def _calculate_points_from_paid_amount(self):
-        if not self.paid_amount:
-            return 0
-        return int((self.paid_amount * Decimal('10')).quantize(Decimal('1'), rounding=ROUND_DOWN))
-
-    def _apply_points_to_customer(self, points):
-        if points <= 0:
-            return
-        customer = self.customer
-        customer.points = (customer.points or 0) + points
-        tier, discount = customer.get_tier_from_points()
-        membership = Membership.objects.filter(tier=tier, is_active=True).order_by('id').first()
-
-        update_fields = ['points']
-        if membership and customer.membership_id != membership.id:
-            customer.membership = membership
-            update_fields.append('membership')
-        if customer.points_discount_percentage != discount:
-            customer.points_discount_percentage = discount
-            update_fields.append('points_discount_percentage')
-
-        customer.save(update_fields=update_fields + ['updated_at'])
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        # Status as stored, so save() can tell a move to delivered from a re-save.
+        order._loaded_status = order.__dict__.get('status')
+        return order
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            current_year = datetime.now().year
-            current_month = datetime.now().month
-            current_day = datetime.now().day
-            customer_id = self.customer.id
-            increase_number = 1
-            new_order = f"ORD{current_year}{current_month}{current_day}{customer_id}000{increase_number}"
-
-            while Order.objects.filter(order_number=new_order).exists():
-                increase_number += 1
-                new_order = f"ORD{current_year}{current_month}{current_day}{customer_id}000{increase_number}"
-
-            self.order_number = new_order
-
-        points_to_award = 0
-        if self.status == 'delivered' and self.points_awarded == 0:
-            previous = None
-            if self.pk:
-                previous = Order.objects.filter(pk=self.pk).values('status', 'points_awarded').first()
-            prev_status = previous['status'] if previous else None
-            prev_awarded = previous['points_awarded'] if previous else 0
-            if prev_status != 'delivered' and prev_awarded == 0:
-                points_to_award = self._calculate_points_from_paid_amount()
-                self.points_awarded = points_to_award
+            # Allocated from a shared counter, so no lookup and no collisions.
+            from .sequences import next_order_number
+            self.order_number = next_order_number()
 
         super().save(*args, **kwargs)
 
-        if points_to_award:
-            self._apply_points_to_customer(points_to_award)
+        if self.status == 'delivered' and getattr(self, '_loaded_status', None) != 'delivered':
+            # Only on the move to delivered; bulk deliveries use loyalty.accrue_points.
+            from .loyalty import award_order_points
+            award_order_points(self)
+        self._loaded_status = self.status
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    # Name and price are copied at checkout so later catalog edits do not rewrite the order.
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    product_name = models.CharField(max_length=100)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name} for Order ID {self.order_id}"
+    
+
+    class Meta:
+        db_table = 'order_items'
+        verbose_name = 'Order Item'
+        verbose_name_plural = 'Order Items'
+        ordering = ['id']
+
+
+class Sequence(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+
+    def __str__(self):
+        return f"{self.name} - {self.value}"
+    
+
+    class Meta:
+        db_table = 'sequences'
+        verbose_name = 'Sequence'
+        verbose_name_plural = 'Sequences'
+
+
+class StockShard(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
+
+
+    def __str__(self):
+        return f"Stock shard {self.shard} of {self.product_id} - {self.quantity}"
+    
+
+    class Meta:
+        db_table = 'stock_shards'
+        verbose_name = 'Stock Shard'
+        verbose_name_plural = 'Stock Shards'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'shard'], name='unique_stock_shard')
+        ]
+
+
+class StockReservation(models.Model):
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (COMMITTED, 'Committed'),
+        (RELEASED, 'Released'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for Order ID {self.order_id} - {self.status}"
+    
+
+    class Meta:
+        db_table = 'stock_reservations'
+        verbose_name = 'Stock Reservation'
+        verbose_name_plural = 'Stock Reservations'
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='stock_res_status_expiry_idx'),
+        ]
 
 
 class CancelledOrder(models.Model):
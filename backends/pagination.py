@@ -0,0 +1,215 @@
+import datetime
+import json
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+
+CURSOR_SALT = 'backends.pagination.cursor'
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder cuts datetimes to milliseconds, which would skip rows between keys.
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer:
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=CursorEncoder).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+def encode_cursor(values, direction, number):
+    payload = {'k': values, 'd': direction, 'n': number}
+    return signing.dumps(payload, salt=CURSOR_SALT, serializer=CursorSerializer, compress=True)
+
+
+def decode_cursor(token):
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT, serializer=CursorSerializer)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get('d') not in ('next', 'prev'):
+        return None
+    return payload
+
+
+def approximate_count(queryset):
+    """Row estimate from table statistics, or None when it is not available.
+
+    Only unfiltered querysets are estimated; the statistics describe the
+    whole table, not a subset of it.
+    """
+    if queryset.query.where:
+        return None
+
+    table = queryset.model._meta.db_table
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        elif vendor == 'mysql':
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [table],
+            )
+        elif vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # Every row for the table starts with its row count; the idx IS NULL row exists only without indexes.
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s ORDER BY idx IS NOT NULL LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        else:
+            return None
+        row = cursor.fetchone()
+
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class CursorPaginator:
+    def __init__(self, queryset, per_page, approximate=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.approximate = approximate
+        self._count = None
+
+    @property
+    def count(self):
+        # Never issues COUNT(*); without statistics the count is unknown.
+        if self._count is None and self.approximate:
+            self._count = approximate_count(self.queryset)
+        return self._count
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return max((self.count + self.per_page - 1) // self.per_page, 1)
+
+
+class CursorPage:
+    """Page object with the same template surface as Django's ``Page``.
+
+    ``next_page_number`` and ``previous_page_number`` return opaque cursor
+    tokens, so existing ``?page=...`` links keep working unchanged.
+    """
+
+    def __init__(self, object_list, number, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._next_cursor = next_cursor
+        self._previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._next_cursor is not None
+
+    def has_previous(self):
+        return self._previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self._next_cursor
+
+    def previous_page_number(self):
+        return self._previous_cursor
+
+
+def _parse_ordering(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def _key_values(obj, fields):
+    values = []
+    for name, _ in fields:
+        value = obj
+        for part in name.split('__'):
+            value = getattr(value, part)
+        values.append(value)
+    return values
+
+
+def _after(fields, values, reverse=False):
+    """Q matching rows strictly after ``values`` in the given ordering."""
+    condition = Q()
+    for index, (name, descending) in enumerate(fields):
+        lookup = 'lt' if descending != reverse else 'gt'
+        branch = Q(**{f'{name}__{lookup}': values[index]})
+        for previous_index in range(index):
+            branch &= Q(**{fields[previous_index][0]: values[previous_index]})
+        condition |= branch
+    return condition
+
+
+def paginate_keyset(page_token, queryset, ordering, per_page, approximate_count=False):
+    """Return a ``CursorPage`` for ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` must end in a unique, non-null column (usually ``id``) so
+    every row has a distinct position. ``page_token`` is a cursor from a
+    previous page, a legacy page number, or empty for the first page.
+    """
+    fields = _parse_ordering(ordering)
+    queryset = queryset.order_by(*ordering)
+    paginator = CursorPaginator(queryset, per_page, approximate=approximate_count)
+
+    cursor = decode_cursor(page_token) if page_token and not str(page_token).isdigit() else None
+    number = 1
+    has_before = False
+    has_after = False
+
+    if cursor and cursor['d'] == 'prev':
+        reversed_ordering = [name if descending else f'-{name}' for name, descending in fields]
+        rows = list(
+            queryset.filter(_after(fields, cursor['k'], reverse=True))
+            .order_by(*reversed_ordering)[:per_page + 1]
+        )
+        has_before = len(rows) > per_page
+        object_list = list(reversed(rows[:per_page]))
+        has_after = True
+        number = max(cursor['n'], 1)
+    elif cursor:
+        rows = list(queryset.filter(_after(fields, cursor['k']))[:per_page + 1])
+        has_after = len(rows) > per_page
+        object_list = rows[:per_page]
+        has_before = True
+        number = cursor['n']
+    else:
+        # First page, or a bookmarked page number from offset pagination.
+        number = int(page_token) if page_token and str(page_token).isdigit() and int(page_token) > 0 else 1
+        offset = (number - 1) * per_page
+        rows = list(queryset[offset:offset + per_page + 1])
+        if not rows and offset:
+            number, offset = 1, 0
+            rows = list(queryset[:per_page + 1])
+        has_after = len(rows) > per_page
+        object_list = rows[:per_page]
+        has_before = number > 1
+
+    next_cursor = None
+    previous_cursor = None
+    if object_list:
+        if has_after:
+            next_cursor = encode_cursor(_key_values(object_list[-1], fields), 'next', number + 1)
+        if has_before:
+            previous_cursor = encode_cursor(_key_values(object_list[0], fields), 'prev', number - 1)
+
+    return CursorPage(object_list, number, paginator, next_cursor, previous_cursor)
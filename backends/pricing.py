@@ -0,0 +1,132 @@
+"""Cart pricing shared by the cart page, checkout and order creation.
+
+All money is ``Decimal`` rounded to whole cents with ROUND_HALF_UP, so a
+cart is quoted the same everywhere and the figures written to an ``Order``
+are exactly the ones the customer was shown.
+"""
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+HUNDRED = Decimal('100')
+
+
+def to_money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(amount):
+    """Integer cents for payment providers."""
+    return int(to_money(amount) * 100)
+
+
+def from_cents(cents):
+    return (Decimal(cents) / 100).quantize(CENT)
+
+
+def tax_rate():
+    return Decimal(str(getattr(settings, 'SALES_TAX_RATE', '0.10')))
+
+
+def discount_percentage(membership_discount=None, points_discount=None):
+    """A membership's discount, even 0%, takes precedence over the points-tier discount.
+
+    ``membership_discount`` is None only when the customer has no membership.
+    """
+    if membership_discount is not None:
+        return Decimal(membership_discount)
+    if points_discount:
+        return Decimal(points_discount)
+    return ZERO
+
+
+def customer_discount(customer):
+    """Discount for a loaded ``Customer``; select_related('membership') avoids a query."""
+    if customer is None:
+        return ZERO
+    membership = customer.membership
+    return discount_percentage(membership.discount_percentage if membership else None, customer.points_discount_percentage)
+
+
+@dataclass(frozen=True)
+class Quote:
+    subtotal: Decimal
+    discount_percentage: Decimal
+    discount: Decimal
+    tax_rate: Decimal
+    tax: Decimal
+    total: Decimal
+    item_count: int = 0
+    unit_count: int = 0
+    lines: list = field(default_factory=list)
+
+    def context(self):
+        """Template context keys used by the cart and checkout pages."""
+        return {
+            'cart_items': self.lines,
+            'sub_total': self.subtotal,
+            'discount_percentage': self.discount_percentage,
+            'discount_amount': self.discount,
+            'tax_amount': self.tax,
+            'grand_total': self.total,
+        }
+
+    def summary(self):
+        """JSON-friendly totals, as returned by the cart endpoints."""
+        return {
+            'sub_total': float(self.subtotal),
+            'tax_amount': float(self.tax),
+            'total_discount': float(self.discount),
+            'grand_total': float(self.total),
+        }
+
+
+def quote_subtotal(subtotal, percentage=ZERO, item_count=0, unit_count=0, lines=None):
+    """Quote a known subtotal; the discount applies before tax."""
+    subtotal = to_money(subtotal or ZERO)
+    percentage = Decimal(percentage or ZERO)
+    rate = tax_rate()
+    discount = to_money(subtotal * percentage / HUNDRED)
+    tax = to_money((subtotal - discount) * rate)
+    return Quote(
+        subtotal=subtotal,
+        discount_percentage=percentage,
+        discount=discount,
+        tax_rate=rate,
+        tax=tax,
+        total=subtotal - discount + tax,
+        item_count=item_count,
+        unit_count=unit_count,
+        lines=lines if lines is not None else [],
+    )
+
+
+def quote_lines(lines, percentage=ZERO):
+    """Price cart lines in one pass.
+
+    ``lines`` are ``CartItem`` rows with ``product`` loaded, or guest-cart
+    lines; each gets a ``subtotal`` attribute for the templates.
+    """
+    lines = list(lines)
+    subtotal = ZERO
+    units = 0
+    for line in lines:
+        line.subtotal = line.product.price * line.quantity
+        subtotal += line.subtotal
+        units += line.quantity
+    return quote_subtotal(subtotal, percentage, len(lines), units, lines)
+
+
+def quote_summary(summary):
+    """Quote a ``carts.cart_summary`` row without reading the cart lines."""
+    if not summary:
+        return quote_subtotal(ZERO)
+    return quote_subtotal(
+        summary['subtotal'],
+        discount_percentage(summary['membership_discount'], summary['points_discount']),
+        summary['item_count'],
+        summary['unit_count'],
+    )
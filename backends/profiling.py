@@ -0,0 +1,199 @@
+"""Sampling profiler for single requests.
+
+A background thread reads the request thread's stack from
+``sys._current_frames()`` at a fixed interval, so the profiled code runs
+unmodified and the cost is one stack walk per sample. Profiles are saved
+as collapsed stacks (for flamegraph.pl and similar) and speedscope JSON.
+"""
+import heapq
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+PROFILE_FLAG = '_profile'
+PROFILE_HEADER = 'X-Profile'
+
+# Slowest sampled profiles per view in this process, as (duration, stem) min-heaps.
+_slowest = defaultdict(list)
+_slowest_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+
+def _short_path(filename):
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        return os.path.relpath(filename, base)
+    marker = 'site-packages' + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return filename
+
+
+def _frame_label(frame):
+    filename, name, line = frame
+    return f'{name} ({_short_path(filename)}:{line})'
+
+
+def collapsed(samples):
+    """``frame;frame;frame count`` lines, root first."""
+    lines = [
+        ';'.join(_frame_label(frame) for frame in stack) + f' {count}'
+        for stack, count in samples.most_common()
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def speedscope(samples, name, interval, duration):
+    frames = []
+    index = {}
+    profile_samples = []
+    weights = []
+    for stack, count in samples.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                filename, function, line = frame
+                frames.append({'name': function, 'file': _short_path(filename), 'line': line})
+            ids.append(index[frame])
+        profile_samples.append(ids)
+        weights.append(round(count * interval * 1000, 3))
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'backends.profiling',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': round(duration * 1000, 3),
+            'samples': profile_samples,
+            'weights': weights,
+        }],
+    }
+
+
+def profile_dir():
+    directory = _setting('PROFILING_DIR', '') or os.path.join(tempfile.gettempdir(), 'luxeprestige-profiles')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def save_profile(sampler, view_name, path, duration):
+    """Write both formats; returns the file name stem."""
+    safe_view = ''.join(char if char.isalnum() else '-' for char in view_name or 'unresolved')
+    stem = f'{time.strftime("%Y%m%d-%H%M%S")}-{safe_view}-{int(duration * 1000)}ms-{uuid.uuid4().hex[:8]}'
+    directory = profile_dir()
+    name = f'{view_name} {path} ({duration * 1000:.0f}ms)'
+    with open(os.path.join(directory, stem + '.collapsed'), 'w') as output:
+        output.write(collapsed(sampler.samples))
+    with open(os.path.join(directory, stem + '.speedscope.json'), 'w') as output:
+        json.dump(speedscope(sampler.samples, name, sampler.interval, duration), output)
+    return stem
+
+
+def delete_profile(stem):
+    directory = profile_dir()
+    for suffix in ('.collapsed', '.speedscope.json'):
+        try:
+            os.remove(os.path.join(directory, stem + suffix))
+        except FileNotFoundError:
+            pass
+
+
+class ProfilingMiddleware:
+    """Profile a request on demand, or sample 1 in N requests per view.
+
+    Staff users trigger a profile with ``?_profile=1`` or an ``X-Profile``
+    header; the saved file name comes back in ``X-Profile-Id``. With
+    ``PROFILING_SAMPLE_RATE = N`` one in N requests of every view is also
+    profiled, and only the ``PROFILING_KEEP_SLOWEST`` slowest profiles per
+    view are kept on disk by each process.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _requested(self, request):
+        if PROFILE_FLAG not in request.GET and PROFILE_HEADER not in request.headers:
+            return False
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_authenticated and user.is_staff)
+
+    def __call__(self, request):
+        on_demand = self._requested(request)
+        rate = _setting('PROFILING_SAMPLE_RATE', 0)
+        if not on_demand and not (rate and random.randrange(rate) == 0):
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), _setting('PROFILING_INTERVAL', 0.005))
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        if on_demand:
+            response.headers['X-Profile-Id'] = save_profile(sampler, view_name, request.path, duration)
+        else:
+            self._keep_if_slow(sampler, view_name, request.path, duration)
+        return response
+
+    def _keep_if_slow(self, sampler, view_name, path, duration):
+        keep = _setting('PROFILING_KEEP_SLOWEST', 5)
+        if keep <= 0:
+            return
+        with _slowest_lock:
+            slowest = _slowest[view_name]
+            if slowest and len(slowest) >= keep and duration <= slowest[0][0]:
+                return
+            stem = save_profile(sampler, view_name, path, duration)
+            heapq.heappush(slowest, (duration, stem))
+            while len(slowest) > keep:
+                _, evicted = heapq.heappop(slowest)
+                delete_profile(evicted)
@@ -0,0 +1,112 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Func, IntegerField, Sum, Value, When
+
+from .models import Product, Review
+
+
+def average_rating(rating_sum, total_review):
+    if not total_review:
+        return Decimal('0.00')
+    return (Decimal(rating_sum) / total_review).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class IntegerDivision(Func):
+    """Truncating integer division on every backend (MySQL's ``/`` returns a decimal)."""
+    arg_joiner = ' / '
+    template = '(%(expressions)s)'
+    output_field = IntegerField()
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, arg_joiner=' DIV ', **extra_context)
+
+
+def average_rating_expression(rating_sum, total_review):
+    """SQL for ``average_rating``: ROUND_HALF_UP to cents in integer arithmetic, so both paths agree."""
+    half_up = IntegerDivision(Value(200) * rating_sum + total_review, Value(2) * total_review)
+    return half_up * Value(Decimal('0.01'), output_field=DecimalField(max_digits=5, decimal_places=2))
+
+
+def apply_rating_change(product_id, rating_delta, count_delta):
+    """Adjust one product's rating aggregates by a review write.
+
+    One single-row UPDATE, independent of how many reviews the product
+    has. The average is derived from the new sum and count so it never
+    drifts through rounding.
+    """
+    rating_sum = F('rating_sum') + rating_delta
+    total_review = F('total_review') + count_delta
+    # average_rating is assigned first: MySQL evaluates SET left to right with the new values.
+    Product.objects.filter(pk=product_id).update(
+        average_rating=Case(
+            When(total_review__gt=-count_delta, then=average_rating_expression(rating_sum, total_review)),
+            default=Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+        rating_sum=rating_sum,
+        total_review=total_review,
+    )
+
+
+def review_loaded(review):
+    """Remember the stored product and rating so later writes can diff them."""
+    loaded = review.__dict__
+    if review.pk and 'product_id' in loaded and 'rating' in loaded:
+        review._rating_snapshot = (loaded['product_id'], loaded['rating'])
+    else:
+        review._rating_snapshot = None
+
+
+def review_saved(review, created):
+    previous = None if created else getattr(review, '_rating_snapshot', None)
+    if previous is None:
+        apply_rating_change(review.product_id, review.rating, 1)
+    elif previous[0] != review.product_id:
+        apply_rating_change(previous[0], -previous[1], -1)
+        apply_rating_change(review.product_id, review.rating, 1)
+    elif previous[1] != review.rating:
+        apply_rating_change(review.product_id, review.rating - previous[1], 0)
+    review._rating_snapshot = (review.product_id, review.rating)
+
+
+def review_deleted(review):
+    previous = getattr(review, '_rating_snapshot', None) or (review.product_id, review.rating)
+    apply_rating_change(previous[0], -previous[1], -1)
+
+
+def recompute_all(batch_size=1000):
+    """Rebuild every product's rating aggregates from the reviews table.
+
+    Reviews are grouped in a single query; products are then updated in
+    batches with bulk_update. Returns the number of products changed.
+    """
+    totals = {
+        row['product_id']: (row['rating_sum'], row['total'])
+        for row in Review.objects.values('product_id').annotate(
+            rating_sum=Sum('rating'), total=Count('id')
+        ).order_by()
+    }
+
+    changed = []
+    updated = 0
+    fields = ['rating_sum', 'total_review', 'average_rating']
+    products = Product.objects.only('id', *fields).order_by('id')
+    with transaction.atomic():
+        for product in products.iterator(chunk_size=batch_size):
+            rating_sum, total = totals.get(product.id, (0, 0))
+            average = average_rating(rating_sum, total)
+            if (product.rating_sum, product.total_review, product.average_rating) == (rating_sum, total, average):
+                continue
+            product.rating_sum = rating_sum
+            product.total_review = total
+            product.average_rating = average
+            changed.append(product)
+            if len(changed) >= batch_size:
+                Product.objects.bulk_update(changed, fields)
+                updated += len(changed)
+                changed = []
+        if changed:
+            Product.objects.bulk_update(changed, fields)
+            updated += len(changed)
+    return updated
@@ -0,0 +1,439 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+
+from .models import Product, ProductSearchDocument
+
+FTS_TABLE = 'product_search_fts'
+MAX_QUERY_TERMS = 10
+# The Python index hands at most this many best-scoring ids to the database.
+MAX_INDEX_MATCHES = 1000
+GENERATION_CACHE_KEY = 'search:generation'
+INDEXED_PRODUCT_FIELDS = {'name', 'description', 'brand', 'category'}
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = [
+    ('0-100', 'Under $100', Decimal('0'), Decimal('100')),
+    ('100-500', '$100 - $500', Decimal('100'), Decimal('500')),
+    ('500-1000', '$500 - $1,000', Decimal('500'), Decimal('1000')),
+    ('1000-5000', '$1,000 - $5,000', Decimal('1000'), Decimal('5000')),
+    ('5000+', '$5,000 and above', Decimal('5000'), None),
+]
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def document_fields(product):
+    return {
+        'name': product.name,
+        'description': product.description or '',
+        'brand_name': product.brand.name if product.brand_id else '',
+        'category_name': product.category.name if product.category_id else '',
+    }
+
+
+class SQLiteFTSBackend:
+    """SQLite FTS5 index kept in sync with the document table by triggers."""
+
+    name = 'sqlite'
+
+    def _match_expression(self, terms):
+        return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    def filter(self, queryset, terms):
+        return queryset.extra(
+            where=[f'products.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'],
+            params=[self._match_expression(terms)],
+        )
+
+    def ranked_ids(self, queryset, terms, offset, limit):
+        ranked = queryset.extra(
+            select={
+                'search_rank': (
+                    f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0, 4.0, 4.0) FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = products.id'
+                ),
+            },
+            select_params=[self._match_expression(terms)],
+        ).order_by('-search_rank', 'id')
+        return [row[0] for row in ranked.values_list('id', 'search_rank')[offset:offset + limit]]
+
+    def documents_changed(self, product_ids):
+        pass
+
+    def documents_removed(self, product_ids):
+        pass
+
+
+class MySQLFullTextBackend:
+    """MySQL FULLTEXT index over the document table, queried in boolean mode.
+
+    InnoDB never indexes stopwords or tokens shorter than
+    ``innodb_ft_min_token_size``, so a required ``+term*`` for one of those
+    matches nothing. Such terms are matched with ``icontains`` on the
+    document table instead.
+    """
+
+    name = 'mysql'
+    # innodb_ft_min_token_size and INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD.
+    min_token_size = 3
+    stopwords = frozenset({
+        'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i', 'in',
+        'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who',
+        'will', 'with', 'und', 'www',
+    })
+    match_sql = (
+        'MATCH(product_search_documents.name, product_search_documents.description, '
+        'product_search_documents.brand_name, product_search_documents.category_name) '
+        'AGAINST (%s IN BOOLEAN MODE)'
+    )
+
+    def _match_expression(self, terms):
+        return ' '.join(f'+{term}*' for term in terms)
+
+    def _indexed(self, term):
+        return len(term) >= self.min_token_size and term not in self.stopwords
+
+    def filter(self, queryset, terms):
+        for term in terms:
+            if not self._indexed(term):
+                queryset = queryset.filter(
+                    Q(search_document__name__icontains=term)
+                    | Q(search_document__description__icontains=term)
+                    | Q(search_document__brand_name__icontains=term)
+                    | Q(search_document__category_name__icontains=term)
+                )
+        indexed = [term for term in terms if self._indexed(term)]
+        if not indexed:
+            return queryset
+        return queryset.extra(
+            where=[
+                'products.id IN (SELECT product_search_documents.product_id '
+                f'FROM product_search_documents WHERE {self.match_sql})'
+            ],
+            params=[self._match_expression(indexed)],
+        )
+
+    def ranked_ids(self, queryset, terms, offset, limit):
+        terms = [term for term in terms if self._indexed(term)]
+        if not terms:
+            return list(queryset.order_by('id').values_list('id', flat=True)[offset:offset + limit])
+        ranked = queryset.extra(
+            select={
+                'search_rank': (
+                    f'SELECT {self.match_sql} FROM product_search_documents '
+                    'WHERE product_search_documents.product_id = products.id'
+                ),
+            },
+            select_params=[self._match_expression(terms)],
+        ).order_by('-search_rank', 'id')
+        return [row[0] for row in ranked.values_list('id', 'search_rank')[offset:offset + limit]]
+
+    def documents_changed(self, product_ids):
+        pass
+
+    def documents_removed(self, product_ids):
+        pass
+
+
+class PythonIndexBackend:
+    """In-process inverted index for databases without a native full-text engine.
+
+    The index is loaded once from the document table and then updated
+    incrementally. Writes bump a shared generation counter in the cache so
+    other worker processes know to reload their copy.
+    """
+
+    name = 'python'
+    field_weights = {'name': 10, 'description': 1, 'brand_name': 4, 'category_name': 4}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._documents = {}
+        self._sorted_tokens = []
+        self._generation = None
+
+    def _add(self, product_id, fields):
+        weights = {}
+        for field_name, weight in self.field_weights.items():
+            for token in tokenize(fields.get(field_name)):
+                weights[token] = weights.get(token, 0) + weight
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[product_id] = weight
+        self._documents[product_id] = list(weights)
+
+    def _remove(self, product_id):
+        for token in self._documents.pop(product_id, []):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def _load(self):
+        self._postings = {}
+        self._documents = {}
+        documents = ProductSearchDocument.objects.values(
+            'product_id', 'name', 'description', 'brand_name', 'category_name'
+        )
+        for document in documents.iterator(chunk_size=2000):
+            self._add(document['product_id'], document)
+        self._sorted_tokens = sorted(self._postings)
+
+    def _ensure_loaded(self):
+        generation = cache.get(GENERATION_CACHE_KEY, 0)
+        with self._lock:
+            if self._generation != generation:
+                self._load()
+                self._generation = generation
+
+    def _bump_generation(self):
+        try:
+            generation = cache.incr(GENERATION_CACHE_KEY)
+        except ValueError:
+            cache.add(GENERATION_CACHE_KEY, 1, None)
+            generation = cache.get(GENERATION_CACHE_KEY, 1)
+        return generation
+
+    def _expand(self, term):
+        # Prefix match, so "dia" finds "diamond" like the SQL backends do.
+        matches = []
+        position = bisect_left(self._sorted_tokens, term)
+        while position < len(self._sorted_tokens) and self._sorted_tokens[position].startswith(term):
+            matches.append(self._sorted_tokens[position])
+            position += 1
+        return matches
+
+    def scores(self, terms):
+        self._ensure_loaded()
+        result = None
+        with self._lock:
+            for term in terms:
+                term_scores = {}
+                for token in self._expand(term):
+                    for product_id, weight in self._postings[token].items():
+                        term_scores[product_id] = term_scores.get(product_id, 0) + weight
+                if result is None:
+                    result = term_scores
+                else:
+                    result = {pid: score + term_scores[pid] for pid, score in result.items() if pid in term_scores}
+                if not result:
+                    return {}
+        return result or {}
+
+    def filter(self, queryset, terms):
+        # Only the best matches, so the IN list stays bounded on broad queries.
+        scores = self.scores(terms)
+        best = heapq.nlargest(MAX_INDEX_MATCHES, scores, key=lambda pid: (scores[pid], -pid))
+        return queryset.filter(id__in=best)
+
+    def ranked_ids(self, queryset, terms, offset, limit):
+        scores = self.scores(terms)
+        ids = queryset.values_list('id', flat=True)
+        ordered = sorted(ids, key=lambda pid: (-scores.get(pid, 0), pid))
+        return ordered[offset:offset + limit]
+
+    def _advance_generation(self):
+        # Always bumped, so workers that never searched still invalidate the others.
+        # The patched index is only current if no other worker bumped in between.
+        previous = self._generation
+        generation = self._bump_generation()
+        self._generation = generation if previous is not None and generation == previous + 1 else None
+
+    def documents_changed(self, product_ids):
+        documents = None
+        if self._generation is not None:
+            documents = list(ProductSearchDocument.objects.filter(product_id__in=product_ids).values(
+                'product_id', 'name', 'description', 'brand_name', 'category_name'
+            ))
+        with self._lock:
+            if documents is None:
+                # Loaded by another thread since the check above, without these changes.
+                self._generation = None
+            if self._generation is not None:
+                for product_id in product_ids:
+                    self._remove(product_id)
+                for document in documents:
+                    self._add(document['product_id'], document)
+                self._sorted_tokens = sorted(self._postings)
+            self._advance_generation()
+
+    def documents_removed(self, product_ids):
+        with self._lock:
+            if self._generation is not None:
+                for product_id in product_ids:
+                    self._remove(product_id)
+                self._sorted_tokens = sorted(self._postings)
+            self._advance_generation()
+
+
+_backend = None
+
+
+def _fts_table_exists():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        choice = getattr(settings, 'SEARCH_BACKEND', 'auto')
+        if choice == 'auto':
+            if connection.vendor == 'sqlite' and _fts_table_exists():
+                choice = 'sqlite'
+            elif connection.vendor == 'mysql':
+                choice = 'mysql'
+            else:
+                choice = 'python'
+        backends = {
+            'sqlite': SQLiteFTSBackend,
+            'mysql': MySQLFullTextBackend,
+            'python': PythonIndexBackend,
+        }
+        _backend = backends[choice]()
+    return _backend
+
+
+def index_products(product_ids):
+    """Create or refresh the search documents for the given products."""
+    product_ids = list(product_ids)
+    products = Product.objects.filter(id__in=product_ids).select_related('brand', 'category')
+    documents = [ProductSearchDocument(product=product, **document_fields(product)) for product in products]
+    ProductSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['name', 'description', 'brand_name', 'category_name', 'updated_at'],
+    )
+    get_search_backend().documents_changed(product_ids)
+
+
+def rename_brand(brand):
+    documents = ProductSearchDocument.objects.filter(product__brand_id=brand.id).exclude(brand_name=brand.name)
+    product_ids = list(documents.values_list('product_id', flat=True))
+    if product_ids:
+        ProductSearchDocument.objects.filter(product_id__in=product_ids).update(brand_name=brand.name)
+        get_search_backend().documents_changed(product_ids)
+
+
+def rename_category(category):
+    documents = ProductSearchDocument.objects.filter(product__category_id=category.id).exclude(category_name=category.name)
+    product_ids = list(documents.values_list('product_id', flat=True))
+    if product_ids:
+        ProductSearchDocument.objects.filter(product_id__in=product_ids).update(category_name=category.name)
+        get_search_backend().documents_changed(product_ids)
+
+
+def remove_products(product_ids):
+    get_search_backend().documents_removed(list(product_ids))
+
+
+def _price_band(key):
+    for band in PRICE_BANDS:
+        if band[0] == key:
+            return band
+    return None
+
+
+def _price_q(band):
+    _, _, low, high = band
+    condition = Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+@dataclass
+class SearchResult:
+    query: str
+    products: list = field(default_factory=list)
+    total: int = 0
+    page: int = 1
+    per_page: int = 24
+    facets: dict = field(default_factory=dict)
+
+    @property
+    def num_pages(self):
+        return max((self.total + self.per_page - 1) // self.per_page, 1)
+
+    @property
+    def has_next(self):
+        return self.page < self.num_pages
+
+    @property
+    def has_previous(self):
+        return self.page > 1
+
+
+def search_products(query, brand_id=None, category_id=None, price_band=None, page=1, per_page=24):
+    """Run a full-text query and return one page of products plus facet counts.
+
+    Each facet is counted with the other active filters applied, so a
+    shopper can see how many results a brand, category or price band holds.
+    """
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    result = SearchResult(query=query, page=page, per_page=per_page)
+    if not terms:
+        return result
+
+    backend = get_search_backend()
+    matches = backend.filter(Product.objects.filter(is_active=True), terms)
+
+    band = _price_band(price_band) if price_band else None
+    brand_q = Q(brand_id=brand_id) if brand_id else Q()
+    category_q = Q(category_id=category_id) if category_id else Q()
+    price_q = _price_q(band) if band else Q()
+
+    brand_counts = (
+        matches.filter(category_q, price_q)
+        .values('brand_id', 'brand__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'brand__name')
+    )
+    category_counts = (
+        matches.filter(brand_q, price_q)
+        .values('category_id', 'category__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'category__name')
+    )
+    price_counts = matches.filter(brand_q, category_q).aggregate(
+        **{entry[0]: Count('id', filter=_price_q(entry)) for entry in PRICE_BANDS}
+    )
+
+    result.facets = {
+        'brands': [
+            {'id': row['brand_id'], 'name': row['brand__name'], 'count': row['count']}
+            for row in brand_counts
+        ],
+        'categories': [
+            {'id': row['category_id'], 'name': row['category__name'], 'count': row['count']}
+            for row in category_counts
+        ],
+        'price_bands': [
+            {'key': key, 'label': label, 'count': price_counts[key]}
+            for key, label, _, _ in PRICE_BANDS
+        ],
+    }
+
+    filtered = matches.filter(brand_q, category_q, price_q)
+    result.total = filtered.count()
+    offset = (page - 1) * per_page
+    ids = backend.ranked_ids(filtered, terms, offset, per_page)
+    products = Product.objects.filter(id__in=ids).select_related('brand', 'category').in_bulk()
+    result.products = [products[pid] for pid in ids if pid in products]
+    return result
@@ -0,0 +1,120 @@
+"""Named counters handed out in blocks, for order numbers and the like.
+
+Each process reserves a block of values with one UPDATE on the
+``sequences`` table and then serves numbers from memory, so allocation is
+constant time and two workers can never receive the same value. Blocks are
+reserved on a separate connection that commits immediately: a block taken
+inside a checkout that later rolls back must stay taken, or another worker
+would be handed the same numbers. Values left in a block when a process
+exits are skipped, so sequences have gaps but never repeats.
+
+SQLite allows only one writer, so there the block is taken on the request's
+own connection; inside a transaction that means a block of one.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+ORDER_NUMBER_SEQUENCE = 'order_number'
+# ORD + YYYYMMDD + 8 digits is 19 of Order.order_number's 20 characters. The
+# sequence wraps at 10**8, so numbers only repeat past 10**8 orders in one day.
+ORDER_NUMBER_DIGITS = 8
+
+
+class BlockAllocator:
+    def __init__(self, name, block_size):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def next_value(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = reserve_block(self.name, self.block_size)
+            value = self._next
+            self._next += 1
+            return value
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+_block_connection = threading.local()
+
+
+def _table():
+    from .models import Sequence
+    return connection.ops.quote_name(Sequence._meta.db_table)
+
+
+def _increment(cursor, name, size):
+    """Advance ``name`` by ``size`` and return the new high-water mark."""
+    table = _table()
+    cursor.execute(f'UPDATE {table} SET value = value + %s WHERE name = %s', [size, name])
+    if cursor.rowcount == 0:
+        cursor.execute(f'INSERT INTO {table} (name, value) VALUES (%s, %s)', [name, size])
+        return size
+    cursor.execute(f'SELECT value FROM {table} WHERE name = %s', [name])
+    return cursor.fetchone()[0]
+
+
+def _separate_connection():
+    wrapper = getattr(_block_connection, 'wrapper', None)
+    if wrapper is None:
+        wrapper = _block_connection.wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+    wrapper.close_if_unusable_or_obsolete()
+    return wrapper
+
+
+def close_block_connection():
+    """Close this thread's block connection; threads that reserved blocks must call it before exiting."""
+    wrapper = getattr(_block_connection, 'wrapper', None)
+    if wrapper is not None:
+        wrapper.close()
+        del _block_connection.wrapper
+
+
+def reserve_block(name, size):
+    """Reserve ``size`` consecutive values of ``name``; returns ``(first, end)``."""
+    if connection.vendor == 'sqlite':
+        if connection.in_atomic_block:
+            # Rolled back together with the caller, so nothing may be cached.
+            size = 1
+        with transaction.atomic(), connection.cursor() as cursor:
+            high = _increment(cursor, name, size)
+        return high - size + 1, high + 1
+
+    wrapper = _separate_connection()
+    wrapper.ensure_connection()
+    wrapper.set_autocommit(False)
+    try:
+        with wrapper.cursor() as cursor:
+            high = _increment(cursor, name, size)
+        wrapper.commit()
+    except Exception:
+        wrapper.rollback()
+        raise
+    finally:
+        wrapper.set_autocommit(True)
+    return high - size + 1, high + 1
+
+
+def allocator(name, block_size=None):
+    with _allocators_lock:
+        if name not in _allocators:
+            _allocators[name] = BlockAllocator(name, block_size or getattr(settings, 'SEQUENCE_BLOCK_SIZE', 20))
+        return _allocators[name]
+
+
+def next_value(name):
+    return allocator(name).next_value()
+
+
+def next_order_number(date=None):
+    """``ORD`` + ``YYYYMMDD`` + an 8-digit global sequence, 19 characters."""
+    date = date or timezone.localdate()
+    value = next_value(ORDER_NUMBER_SEQUENCE) % 10 ** ORDER_NUMBER_DIGITS
+    return f'ORD{date:%Y%m%d}{value:0{ORDER_NUMBER_DIGITS}d}'
@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import caching, carts, images, ratings, search
+from .homepage import invalidate_homepage_snapshot
+from .models import Brand, CartItem, Category, Membership, Product, ProductImage, Review
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_homepage_snapshot(sender, **kwargs):
+    invalidate_homepage_snapshot()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def bump_cache_version(sender, **kwargs):
+    caching.model_changed(sender)
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & search.INDEXED_PRODUCT_FIELDS:
+        return
+    search.index_products([instance.id])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, **kwargs):
+    search.remove_products([instance.id])
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_products(sender, instance, created, **kwargs):
+    if not created:
+        search.rename_brand(instance)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        search.rename_category(instance)
+
+
+@receiver(post_init, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    ratings.review_loaded(instance)
+
+
+@receiver(post_save, sender=Review)
+def add_review_to_product_rating(sender, instance, created, **kwargs):
+    ratings.review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_product_rating(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
+
+
+@receiver(post_init, sender=CartItem)
+def remember_cart_item_quantity(sender, instance, **kwargs):
+    carts.cart_item_loaded(instance)
+
+
+@receiver(post_save, sender=CartItem)
+def add_cart_item_to_totals(sender, instance, created, **kwargs):
+    carts.cart_item_saved(instance, created)
+
+
+@receiver(post_delete, sender=CartItem)
+def remove_cart_item_from_totals(sender, instance, **kwargs):
+    carts.cart_item_deleted(instance)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_price(sender, instance, update_fields=None, **kwargs):
+    carts.product_saving(instance, update_fields)
+
+
+@receiver(post_save, sender=Product)
+def reprice_carts(sender, instance, created, update_fields=None, **kwargs):
+    carts.product_saved(instance, created, update_fields)
+
+
+def _schedule_derivatives(*files):
+    names = [file.name for file in files if file]
+    if names:
+        transaction.on_commit(lambda: images.schedule_derivatives(names))
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_product_image_derivatives(sender, instance, **kwargs):
+    _schedule_derivatives(instance.image)
+
+
+@receiver(post_save, sender=Product)
+def generate_product_derivatives(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'product_image' not in update_fields:
+        return
+    _schedule_derivatives(instance.product_image)
+
+
+@receiver(post_save, sender=Category)
+def generate_category_derivatives(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'category_image' not in update_fields:
+        return
+    _schedule_derivatives(instance.category_image)
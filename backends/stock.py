@@ -0,0 +1,201 @@
+"""Stock reservations taken at checkout.
+
+Stock is claimed with a conditional UPDATE (``avl_quantity >= n``), so two
+buyers racing for the last unit cannot both win and only the product rows
+being bought are locked. A reservation holds the units until the order is
+paid (committed) or its TTL passes and ``release_expired`` puts them back.
+That happens lazily too: a checkout that comes up short first returns the
+expired reservations of the products it wants, so abandoned checkouts do
+not need the sweeper to become sellable again. Products flagged for
+sharded stock are routed to ``backends.stock_shards``.
+
+Carts claim nothing; their stock checks are advisory and only the claim
+here can fail a purchase.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from . import stock_shards
+from .models import Product, StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, requested):
+        super().__init__(f'Not enough stock for product {product_id} (requested {requested}).')
+        self.product_id = product_id
+        self.requested = requested
+
+
+class _Shortfall(Exception):
+    pass
+
+
+def take(product_id, quantity, shards=0):
+    """Decrement stock if at least ``quantity`` is available; True on success."""
+    if shards:
+        return stock_shards.take(product_id, quantity, shards)
+    return bool(
+        Product.objects.filter(pk=product_id, avl_quantity__gte=quantity).update(
+            avl_quantity=F('avl_quantity') - quantity,
+        )
+    )
+
+
+def give_back(product_id, quantity, shards=0):
+    if shards:
+        stock_shards.give_back(product_id, quantity, shards)
+        return
+    Product.objects.filter(pk=product_id).update(avl_quantity=F('avl_quantity') + quantity)
+
+
+def _take_all(wanted, shards):
+    """Claim every ``{product_id: quantity}`` or raise ``_Shortfall``.
+
+    Unsharded products are claimed together with one conditional UPDATE;
+    if it matches fewer rows than requested some product is short.
+    """
+    plain = {product_id: quantity for product_id, quantity in wanted.items() if not shards.get(product_id)}
+    if plain:
+        amount = Case(
+            *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in plain.items()],
+            output_field=IntegerField(),
+        )
+        claimed = Product.objects.filter(pk__in=plain, avl_quantity__gte=amount).update(
+            avl_quantity=F('avl_quantity') - amount,
+        )
+        if claimed != len(plain):
+            raise _Shortfall
+    for product_id in sorted(wanted):
+        if shards.get(product_id) and not take(product_id, wanted[product_id], shards[product_id]):
+            raise _Shortfall
+
+
+def reserve_order(order, lines, ttl=None):
+    """Hold stock for every ``(product_id, quantity)`` line of ``order``.
+
+    All or nothing: a short product raises ``InsufficientStock`` and the
+    decrements already made are rolled back. Before giving up, expired
+    reservations of the wanted products are released and the claim is
+    tried once more.
+    """
+    wanted = Counter()
+    for product_id, quantity in lines:
+        wanted[product_id] += quantity
+    ttl = ttl if ttl is not None else getattr(settings, 'STOCK_RESERVATION_TTL', 900)
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _take_all(wanted, stock_shards.shard_counts(wanted))
+                return StockReservation.objects.bulk_create([
+                    StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+                    for product_id, quantity in sorted(wanted.items())
+                ])
+        except _Shortfall:
+            if attempt or not release_expired(product_ids=wanted):
+                break
+    # Rolled back, so current stock names the short product.
+    available = dict(Product.objects.filter(pk__in=wanted).values_list('id', 'avl_quantity'))
+    product_id = next(
+        (product_id for product_id in sorted(wanted) if available.get(product_id, 0) < wanted[product_id]),
+        min(wanted),
+    )
+    raise InsufficientStock(product_id, wanted[product_id])
+
+
+def commit_order(order):
+    """Make an order's reservations permanent once it is paid.
+
+    Reservations the sweeper already released (payment arrived after the
+    TTL) are claimed again; a shortfall is logged rather than failing the
+    paid order.
+    """
+    with transaction.atomic():
+        StockReservation.objects.filter(order=order, status=StockReservation.HELD).update(
+            status=StockReservation.COMMITTED, updated_at=timezone.now(),
+        )
+        released = list(
+            StockReservation.objects.select_for_update()
+            .filter(order=order, status=StockReservation.RELEASED)
+            .order_by('product_id')
+        )
+        shards = stock_shards.shard_counts({reservation.product_id for reservation in released})
+        for reservation in released:
+            if not take(reservation.product_id, reservation.quantity, shards.get(reservation.product_id, 0)):
+                logger.warning(
+                    'Order %s paid after its reservation expired; product %s is short by up to %s.',
+                    order.order_number, reservation.product_id, reservation.quantity,
+                )
+            reservation.status = StockReservation.COMMITTED
+            reservation.save(update_fields=['status', 'updated_at'])
+
+
+def release_order(order):
+    """Give back whatever an unpaid order still holds, e.g. when it is replaced."""
+    return release_orders([order.pk])
+
+
+def release_orders(order_ids, include_committed=False):
+    """Give back the stock still held for ``order_ids``, one UPDATE per product.
+
+    ``include_committed`` also returns the stock of paid orders, for
+    cancellations.
+    """
+    statuses = [StockReservation.HELD]
+    if include_committed:
+        statuses.append(StockReservation.COMMITTED)
+    with transaction.atomic():
+        rows = list(
+            StockReservation.objects.select_for_update()
+            .filter(order_id__in=order_ids, status__in=statuses)
+            .values_list('id', 'product_id', 'quantity')
+        )
+        StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(
+            status=StockReservation.RELEASED, updated_at=timezone.now(),
+        )
+        quantities = Counter()
+        for _, product_id, quantity in rows:
+            quantities[product_id] += quantity
+        shards = stock_shards.shard_counts(quantities)
+        for product_id in sorted(quantities):
+            give_back(product_id, quantities[product_id], shards.get(product_id, 0))
+    return len(rows)
+
+
+def release_expired(now=None, batch_size=500, product_ids=None):
+    """Return stock held by expired reservations; returns how many were released.
+
+    ``product_ids`` limits the sweep to those products, as checkout does.
+    """
+    now = now or timezone.now()
+    expired = StockReservation.objects.filter(status=StockReservation.HELD, expires_at__lte=now)
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=list(product_ids))
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                expired.select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', 'product_id', 'quantity')[:batch_size]
+            )
+            if not rows:
+                return released
+            StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(
+                status=StockReservation.RELEASED, updated_at=now,
+            )
+            quantities = Counter()
+            for _, product_id, quantity in rows:
+                quantities[product_id] += quantity
+            shards = stock_shards.shard_counts(quantities)
+            for product_id in sorted(quantities):
+                give_back(product_id, quantities[product_id], shards.get(product_id, 0))
+        released += len(rows)
@@ -0,0 +1,115 @@
+"""Sharded stock counters for hot products.
+
+A product with ``stock_shard_count > 0`` keeps its sellable stock in that
+many ``StockShard`` rows instead of ``Product.avl_quantity``. Buyers
+decrement a random shard, so concurrent checkouts of one SKU contend on N
+rows rather than one. ``consolidate`` copies the shard totals back into
+``Product.avl_quantity`` and the latest ``Inventory`` row, which is what
+the storefront and inventory pages read.
+
+While a product is sharded its stock changes through this module (or
+``backends.stock``); edit ``avl_quantity`` directly only after ``disable``.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Inventory, Product, StockShard
+
+
+def shard_counts(product_ids):
+    """``{product_id: shard_count}`` for the sharded products among ``product_ids``."""
+    return dict(
+        Product.objects.filter(id__in=product_ids, stock_shard_count__gt=0).values_list('id', 'stock_shard_count')
+    )
+
+
+def enable(product_id, shards):
+    """Split the product's current stock evenly across ``shards`` rows."""
+    if shards < 1:
+        raise ValueError('shards must be at least 1.')
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product_id)
+        if product.stock_shard_count:
+            consolidate([product_id])
+            product.refresh_from_db(fields=['avl_quantity'])
+            StockShard.objects.filter(product_id=product_id).delete()
+        base, extra = divmod(max(product.avl_quantity, 0), shards)
+        StockShard.objects.bulk_create([
+            StockShard(product_id=product_id, shard=index, quantity=base + (1 if index < extra else 0))
+            for index in range(shards)
+        ])
+        Product.objects.filter(pk=product_id).update(stock_shard_count=shards)
+
+
+def disable(product_id):
+    """Fold the shards back into ``Product.avl_quantity`` and drop them."""
+    with transaction.atomic():
+        Product.objects.select_for_update().filter(pk=product_id).first()
+        consolidate([product_id])
+        StockShard.objects.filter(product_id=product_id).delete()
+        Product.objects.filter(pk=product_id).update(stock_shard_count=0)
+
+
+def take(product_id, quantity, shards):
+    """Decrement ``quantity`` across the product's shards; True on success.
+
+    Tries single shards starting from a random one, each with a conditional
+    UPDATE. Only when no one shard can cover the request are all of the
+    product's shards locked and drained in order.
+    """
+    start = random.randrange(shards)
+    for offset in range(shards):
+        updated = StockShard.objects.filter(
+            product_id=product_id, shard=(start + offset) % shards, quantity__gte=quantity,
+        ).update(quantity=F('quantity') - quantity)
+        if updated:
+            return True
+
+    with transaction.atomic():
+        rows = list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by('shard'))
+        if sum(row.quantity for row in rows) < quantity:
+            return False
+        remaining = quantity
+        for row in rows:
+            used = min(row.quantity, remaining)
+            row.quantity -= used
+            remaining -= used
+        StockShard.objects.bulk_update(rows, ['quantity'])
+    return True
+
+
+def give_back(product_id, quantity, shards):
+    StockShard.objects.filter(product_id=product_id, shard=random.randrange(shards)).update(
+        quantity=F('quantity') + quantity,
+    )
+
+
+def consolidate(product_ids=None):
+    """Copy shard totals into ``Product.avl_quantity`` and each product's latest active Inventory row.
+
+    Returns the number of products updated.
+    """
+    products = Product.objects.filter(stock_shard_count__gt=0)
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    totals = StockShard.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+        total=Sum('quantity'),
+    ).values('total')
+    with transaction.atomic():
+        updated = products.update(avl_quantity=Coalesce(Subquery(totals), 0))
+        # Selected first: MySQL cannot UPDATE inventories with a subquery on inventories.
+        latest_ids = {}
+        for inventory_id, product_id in Inventory.objects.filter(
+            product__in=products, is_active=True,
+        ).order_by('product_id', '-created_at', '-id').values_list('id', 'product_id'):
+            latest_ids.setdefault(product_id, inventory_id)
+        if latest_ids:
+            Inventory.objects.filter(pk__in=latest_ids.values()).update(stock_quantity=Subquery(
+                StockShard.objects.filter(product=OuterRef('product')).order_by().values('product').annotate(
+                    total=Sum('quantity'),
+                ).values('total')
+            ))
+    return updated
@@ -0,0 +1,44 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from backends.images import derivative_for
+
+register = template.Library()
+
+
+def _srcset(variants, image_format):
+    return ', '.join(
+        f"{default_storage.url(variant['name'])} {variant['width']}w"
+        for variant in variants
+        if variant['format'] == image_format
+    )
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', css_class='', loading='lazy', element_id=''):
+    """Render an <img> with WebP and JPEG srcsets when derivatives exist.
+
+    Usage: {% responsive_image product.product_image alt=product.name sizes="(min-width: 1024px) 33vw, 100vw" %}
+    Falls back to a plain <img> pointing at the original upload.
+    """
+    if not image:
+        return ''
+
+    attributes = format_html(
+        ' alt="{}" class="{}" loading="{}" decoding="async"{}',
+        alt, css_class, loading,
+        format_html(' id="{}"', element_id) if element_id else '',
+    )
+    derivative = derivative_for(image.name)
+    if not derivative or not derivative['variants']:
+        return format_html('<img src="{}"{}>', image.url, attributes)
+
+    return format_html(
+        '<picture style="display: contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}>'
+        '</picture>',
+        _srcset(derivative['variants'], 'webp'), sizes,
+        image.url, _srcset(derivative['variants'], 'jpeg'), sizes, attributes,
+    )
@@ -1,3 +1,296 @@
-from django.test import TestCase
+import json
+import re
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from . import search, sequences, stock
+from .fulfillment import transition_orders
+from .middleware import QueryBudgetExceeded, QueryCollector
+from .models import Brand, Cart, CartItem, Category, Customer, Order, Product, StockReservation
+from .views import paginate_list
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def create_product(slug, avl_quantity=50, price=Decimal('120.00')):
+    brand, _ = Brand.objects.get_or_create(name='Maison')
+    category, _ = Category.objects.get_or_create(slug='rings', defaults={'name': 'Rings'})
+    return Product.objects.create(
+        name=slug.replace('-', ' ').title(), slug=slug, description='Gold ring', price=price, brand=brand,
+        category=category, weight=Decimal('0.10'), delivery_day_min=3, delivery_day_max=7,
+        avl_quantity=avl_quantity,
+    )
+
+
+def create_customer(username):
+    user = User.objects.create_user(username, f'{username}@example.com', 'secret')
+    customer = Customer.objects.create(
+        customer=user, name=username.title(), email=f'{username}@example.com', password='secret',
+        phone='0123456789',
+    )
+    return user, customer
+
+
+def create_order(customer):
+    return Order.objects.create(
+        customer=customer, vat=0, tax=0, shipping_cost=0, paid_amount=0, due_amount=0, coupon=0, total_amount=0,
+    )
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.product = create_product('ring-0', avl_quantity=5)
+        self.other = create_product('ring-1', avl_quantity=5)
+        _, self.customer = create_customer('shopper')
+
+    def test_reserve_is_all_or_nothing(self):
+        order = create_order(self.customer)
+        with self.assertRaises(stock.InsufficientStock) as raised:
+            stock.reserve_order(order, [(self.product.id, 2), (self.other.id, 6)])
+        self.assertEqual(raised.exception.product_id, self.other.id)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.avl_quantity, 5)
+        self.assertFalse(StockReservation.objects.filter(order=order).exists())
+
+    def test_expired_reservations_are_released_on_shortfall(self):
+        abandoned = create_order(self.customer)
+        stock.reserve_order(abandoned, [(self.product.id, 4)], ttl=-1)
+        order = create_order(self.customer)
+        stock.reserve_order(order, [(self.product.id, 3)])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.avl_quantity, 2)
+        self.assertEqual(StockReservation.objects.get(order=abandoned).status, StockReservation.RELEASED)
+
+    def test_bulk_cancel_returns_paid_stock_with_the_status_change(self):
+        order = create_order(self.customer)
+        stock.reserve_order(order, [(self.product.id, 3)])
+        stock.commit_order(order)
+        Order.objects.filter(pk=order.pk).update(status='processing')
+
+        # The test transaction never commits, so this only passes if no follow-up is needed.
+        stats = transition_orders([order.pk], 'cancelled', notify=False)
+        self.assertEqual(stats['updated'], 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.avl_quantity, 5)
+        self.assertEqual(StockReservation.objects.get(order=order).status, StockReservation.RELEASED)
+
+
+class CartRepricingTests(TestCase):
+    def setUp(self):
+        self.product = create_product('ring-0')
+        _, customer = create_customer('shopper')
+        self.cart = Cart.objects.create(customer=customer)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+
+    def test_price_change_reprices_carts(self):
+        product = Product.objects.get(pk=self.product.pk)
+        product.price = Decimal('150.00')
+        product.save()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, Decimal('300.00'))
+
+    def test_save_without_price_change_leaves_carts_alone(self):
+        Cart.objects.filter(pk=self.cart.pk).update(subtotal=Decimal('1.00'))
+        product = Product.objects.get(pk=self.product.pk)
+        product.description = 'Rose gold ring'
+        product.save()
+        product.save(update_fields=['description'])
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, Decimal('1.00'))
+
+
+class OrderPointsTests(TestCase):
+    def setUp(self):
+        _, self.customer = create_customer('shopper')
+        self.order = create_order(self.customer)
+        self.order.paid_amount = Decimal('1234.56')
+
+    def test_delivery_awards_points_once(self):
+        self.assertEqual(self.order.customer.points, 0)
+        self.order.status = 'delivered'
+        self.order.save()
+        self.assertEqual(self.order.points_awarded, 12345)
+        # The cached customer is dropped, so it is read again with the new balance.
+        self.assertEqual(self.order.customer.points, 12345)
+        self.assertEqual(self.order.customer.points_discount_percentage, Decimal('3.00'))
+
+        stale = Order.objects.get(pk=self.order.pk)
+        stale.points_awarded = 0
+        stale.save()
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.points, 12345)
+
+    def test_saving_an_undelivered_order_skips_accrual(self):
+        self.order.status = 'shipped'
+        with self.assertNumQueries(1):
+            self.order.save()
+
+
+class OrderNumberTests(TestCase):
+    def test_order_numbers_leave_room_in_the_column(self):
+        number = sequences.next_order_number()
+        self.assertRegex(number, r'^ORD\d{16}$')
+        self.assertLess(len(number), Order._meta.get_field('order_number').max_length)
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    def test_two_checkouts_cannot_oversell(self):
+        product = create_product('ring-0', avl_quantity=5)
+        _, customer = create_customer('shopper')
+        orders = [create_order(customer) for _ in range(2)]
+        barrier = threading.Barrier(len(orders))
+        outcomes = []
+
+        def checkout(order):
+            try:
+                barrier.wait()
+                stock.reserve_order(order, [(product.id, 3)])
+                outcomes.append('reserved')
+            except (stock.InsufficientStock, OperationalError):
+                # SQLite reports a concurrent writer as a lock error; either way nothing was taken.
+                outcomes.append('refused')
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        held = sum(StockReservation.objects.filter(product=product).values_list('quantity', flat=True))
+        self.assertEqual(outcomes.count('reserved'), 1)
+        self.assertEqual(held, 3)
+        self.assertEqual(product.avl_quantity, 2)
+
+
+class KeysetPaginationTests(TestCase):
+    def test_cursor_pages_keep_a_numbered_window(self):
+        Brand.objects.bulk_create([Brand(name=f'Brand {index:02d}') for index in range(25)])
+        seen = []
+        page_token = None
+        windows = []
+        while True:
+            page_obj, paginator_list = paginate_list(
+                page_token, Brand.objects.all(), ordering=('name', 'id'), approximate_count=True,
+            )
+            seen.extend(brand.name for brand in page_obj)
+            windows.append(list(paginator_list))
+            if not page_obj.has_next():
+                break
+            page_token = page_obj.next_page_number()
+        self.assertEqual(seen, sorted(f'Brand {index:02d}' for index in range(25)))
+        # No table statistics in the test database: the window reaches one page ahead.
+        self.assertEqual(windows, [[1, 2], [1, 2, 3], [1, 2, 3]])
+
+
+class SearchBackendTests(TestCase):
+    def setUp(self):
+        self.rings = [create_product(f'ring-{index}') for index in range(3)]
+        search.index_products(product.id for product in self.rings)
+
+    def test_mysql_matches_short_terms_without_the_fulltext_index(self):
+        backend = search.MySQLFullTextBackend()
+        matches = backend.filter(Product.objects.all(), ['ri', 'go'])
+        self.assertEqual(sorted(matches.values_list('id', flat=True)), [product.id for product in self.rings])
+        self.assertEqual(len(backend.ranked_ids(matches, ['ri', 'go'], 0, 2)), 2)
+
+    def test_python_index_bounds_the_id_list(self):
+        backend = search.PythonIndexBackend()
+        with mock.patch.object(search, 'MAX_INDEX_MATCHES', 2):
+            matches = backend.filter(Product.objects.all(), ['ring'])
+        self.assertEqual(sorted(matches.values_list('id', flat=True)), [product.id for product in self.rings[:2]])
+
+
+class QueryCollectorTests(TestCase):
+    def test_duplicates_group_statement_shapes(self):
+        collector = QueryCollector()
+        execute = lambda sql, params, many, context: None
+        for sql in ('SELECT * FROM t WHERE id IN (%s, %s)', 'SELECT * FROM t WHERE id IN (%s)', 'SELECT 1'):
+            collector(execute, sql, (), False, {})
+        self.assertEqual(collector.count, 3)
+        self.assertEqual(collector.duplicates(), [{'count': 2, 'sql': 'SELECT * FROM t WHERE id IN (...)'}])
+
+
+@override_settings(SQL_QUERY_BUDGET_ENFORCE=True, SQL_QUERY_BUDGETS={}, GUEST_CART_ENABLED=False)
+class QueryBudgetTests(TestCase):
+    """The cart and checkout views stay within their ``@query_budget``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.customer = create_customer('shopper')
+        cls.products = [create_product(f'ring-{index}') for index in range(3)]
+        cls.cart = Cart.objects.create(customer=cls.customer)
+        for product in cls.products[:2]:
+            CartItem.objects.create(cart=cls.cart, product=product, quantity=2)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertWithinBudget(self, view_name, send):
+        """Run ``send`` twice from the same state: within budget, then with one query less allowed."""
+        with transaction.atomic():
+            response = send()
+            transaction.set_rollback(True)
+        queries = int(SERVER_TIMING_QUERIES.search(response.headers['Server-Timing']).group(1))
+        budget = response.wsgi_request.resolver_match.func.query_budget
+        self.assertLessEqual(queries, budget, f'{view_name} ran {queries} queries, budget {budget}')
+
+        with override_settings(SQL_QUERY_BUDGETS={view_name: queries - 1}):
+            with transaction.atomic():
+                with self.assertRaises(QueryBudgetExceeded):
+                    send()
+                transaction.set_rollback(True)
+        return response
+
+    def test_cart_items(self):
+        response = self.assertWithinBudget('backends:cart_items', lambda: self.client.get(reverse('backends:cart_items')))
+        self.assertEqual(response.status_code, 200)
+
+    def test_cart_items_update(self):
+        item = CartItem.objects.filter(cart=self.cart).first()
+        response = self.assertWithinBudget('backends:cart_items', lambda: self.client.post(
+            reverse('backends:cart_items'), {'action': 'update', 'cart_item_id': item.id, 'quantity': 3},
+        ))
+        self.assertEqual(response.status_code, 302)
+
+    def test_checkout(self):
+        response = self.assertWithinBudget('backends:checkout', lambda: self.client.get(reverse('backends:checkout')))
+        self.assertEqual(response.status_code, 200)
+
+    def test_checkout_creates_order(self):
+        response = self.assertWithinBudget('backends:checkout', lambda: self.client.post(
+            reverse('backends:checkout'), {'shipping_address': '1 Rue de la Paix', 'use_same_address': 'on'},
+        ))
+        self.assertRedirects(response, reverse('backends:payment_process'), fetch_redirect_response=False)
+
+    def test_add_to_cart(self):
+        response = self.assertWithinBudget('backends:add_to_cart', lambda: self.client.post(
+            reverse('backends:add_to_cart'), {'product_id': self.products[2].id, 'quantity': 1},
+        ))
+        self.assertEqual(response.json()['status'], 'success')
+
+    def test_add_to_cart_existing_line(self):
+        response = self.assertWithinBudget('backends:add_to_cart', lambda: self.client.post(
+            reverse('backends:add_to_cart'), {'product_id': self.products[0].id, 'quantity': 1},
+        ))
+        self.assertEqual(response.json()['quantity'], 3)
+
+    def test_cart_batch(self):
+        operations = [
+            {'op': 'set', 'product_id': self.products[0].id, 'quantity': 4},
+            {'op': 'remove', 'product_id': self.products[1].id},
+            {'op': 'add', 'product_id': self.products[2].id, 'quantity': 1},
+        ]
+        response = self.assertWithinBudget('backends:cart_batch', lambda: self.client.post(
+            reverse('backends:cart_batch'), json.dumps({'operations': operations}), content_type='application/json',
+        ))
+        self.assertEqual(response.json()['status'], 'success')
@@ -22,6 +22,9 @@ urlpatterns = [
     path('add_inventory/', views.inventory_add, name='add_inventory'),
     path('get-products-json/', views.get_products_json, name='get-products-json'),
     path('get-categories-json/', views.get_categories_json, name='get-categories-json'),
+    path('export-products/', views.export_products, name='export-products'),
+    path('search/', views.search, name='search'),
+    path('search-json/', views.search_json, name='search-json'),
     path('login/', views.Login, name='login'),
     path('register/', views.Register, name='register'),
     path('verify-otp/<int:user_id>/', views.VerifyOTP, name='verify_otp'),
@@ -29,9 +32,12 @@ urlpatterns = [
     path('logout/', views.Logout, name='logout'),
     path('add-to-cart/', views.add_to_cart, name='add_to_cart'),
     path('cart-items/', views.cartItem, name='cart_items'),
+    path('cart-items/batch/', views.cart_batch, name='cart_batch'),
     path('checkout/', views.checkout, name='checkout'),
     path('payment-process/', views.payment_process, name='payment_process'),
     path('payment-confirm/', views.payment_confirm, name='payment_confirm'),
     path('order-confirmation/<int:order_id>/', views.order_confirmation, name='order_confirmation'),
     path('order-status/<int:order_id>/', views.order_status, name='order_status'),
+    path('order-history/', views.order_history, name='order_history'),
+    path('order-history-json/', views.order_history_json, name='order_history_json'),
 ]
@@ -1,8 +1,9 @@
 import secrets
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
 from django.contrib.auth.models import User
 from .models import EmailOTP
+from .metrics import EMAIL_LATENCY
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.utils import timezone
@@ -45,7 +46,8 @@ LUXURY STORE Team
     )
 
     try:
-        email_message.send(fail_silently=False)
+        with EMAIL_LATENCY.labels('otp').time():
+            email_message.send(fail_silently=False)
     except Exception as e:
         print(f"Error sending OTP email: {e}")
         return None  # Signal that sending failed
@@ -103,13 +105,46 @@ LUXURY STORE Team
     )
 
     try:
-        email_message.send(fail_silently=False)
+        with EMAIL_LATENCY.labels('verification_confirmation').time():
+            email_message.send(fail_silently=False)
         return True
     except Exception as e:
         print(f"Error sending verification confirmation email: {e}")
         return False
 
 
+def send_order_status_emails(status_label, orders):
+    """Tell customers their order moved to ``status_label``.
+
+    ``orders`` yields ``(order_number, customer_name, email)``; every message
+    goes out over one mail connection. Returns the number sent.
+    """
+    messages = [
+        EmailMultiAlternatives(
+            subject=f'Order {order_number} is now {status_label}',
+            body=f"""Dear {name},
+
+Your order {order_number} is now {status_label.lower()}.
+
+Best regards,
+LUXURY STORE Team
+""",
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+        )
+        for order_number, name, email in orders
+        if email
+    ]
+    if not messages:
+        return 0
+    try:
+        with EMAIL_LATENCY.labels('order_status').time():
+            return get_connection(fail_silently=False).send_messages(messages)
+    except Exception as e:
+        print(f"Error sending order status emails: {e}")
+        return 0
+
+
 def send_templated_mail(mail_to, mail_cc, mail_bcc, subject, template, context):
     mail_to_set = set(mail_to) if mail_to else set()
     mail_cc_set = set(mail_cc) if mail_cc else set()
@@ -132,7 +167,8 @@ def send_templated_mail(mail_to, mail_cc, mail_bcc, subject, template, context):
 
         email.attach_alternative(html_body, "text/html")
         try:
-            email.send(fail_silently=False)
+            with EMAIL_LATENCY.labels('templated').time():
+                email.send(fail_silently=False)
 
         except Exception as e:
             print(f"Error sending email: {e}")
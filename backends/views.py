@@ -1,8 +1,8 @@
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.db.models import Case, IntegerField, When
+from django.db.models import Case, IntegerField, Prefetch, When
 from django.contrib import messages
 from django.shortcuts import redirect, render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from django.contrib.auth import authenticate, login, logout
@@ -13,13 +13,23 @@ import json
 import stripe
 from decimal import Decimal
 from .permissions import checkUserPermissions
+from .decorators import conditional_on_queryset, query_budget
 from .models import (
     Brand, Product, ProductCategory, ProductImage, UserPermission, 
     Category, Inventory, Review, Membership, Customer, Cart, CartItem, 
-    Order, OnlinePaymentRequest
+    Order, OrderItem, OnlinePaymentRequest
 )
 from django.contrib.auth.models import User
+from django.conf import settings
 from .utls import generate_otp, verify_otp, send_verification_confirmation_email
+from .search import search_products
+from .pagination import paginate_keyset
+from .export import export_rows, parse_fields, stream_json_array, stream_ndjson
+from .metrics import STRIPE_LATENCY
+from .caching import cached_queryset
+from .carts import cart_summary
+from . import carts, pricing, stock
+from . import guest_cart
 import os
 # Create your views here.
 
@@ -27,28 +37,42 @@ def dashboard(request):
     return render(request, 'backends/dashboard.html')
 
 
-def paginate_list(page_number, data_list):
+def paginate_list(page_number, data_list, ordering=None, approximate_count=False):
+    """Paginate ``data_list`` for the admin listings.
+
+    With ``ordering`` (e.g. ``('name', 'id')``) pages are fetched by keyset
+    instead of OFFSET and no COUNT(*) is issued, so deep pages cost the
+    same as the first one. The page numbers around the current page come
+    from the table statistics when ``approximate_count`` is set and they
+    exist; otherwise the list runs up to the next page.
+    """
     items_per_page, max_page = 10, 10
+    if ordering:
+        page_obj = paginate_keyset(page_number, data_list, ordering, items_per_page, approximate_count)
+        last_page = max(page_obj.paginator.num_pages or 0, page_obj.number + (1 if page_obj.has_next() else 0))
+        return page_obj, page_window(page_obj.number, last_page, max_page)
+
     paginator = Paginator(data_list, items_per_page)
-    page_obj = paginator.get_page(page_number)
     try:
-        data_list = paginator.page(page_number or 1)
+        page_obj = paginator.page(page_number or 1)
 
     except PageNotAnInteger:
-        data_list = paginator.page(1)
+        page_obj = paginator.page(1)
 
     except EmptyPage:
-        data_list = paginator.page(paginator.num_pages)
+        page_obj = paginator.page(paginator.num_pages)
+
+    return page_obj, page_window(page_obj.number, paginator.num_pages, max_page)
 
-    current_page = data_list.number
+
+def page_window(current_page, last_page, max_page):
     start_page = max(current_page - max_page // 2, 1)
     end_page = start_page + max_page
-    if end_page > paginator.num_pages:
-        end_page = paginator.num_pages
+    if end_page > last_page:
+        end_page = last_page
         start_page = max(end_page - max_page, 1)
 
-    paginator_list = range(start_page, end_page + 1)
-    return page_obj, paginator_list
+    return range(start_page, end_page + 1)
 
 
 def brand(request):
@@ -82,7 +106,7 @@ def brand(request):
             
         brands = Brand.objects.all().order_by('name')
         page_number = request.GET.get('page')
-        page_obj, paginator_list = paginate_list(page_number, brands)
+        page_obj, paginator_list = paginate_list(page_number, brands, ordering=('name', 'id'), approximate_count=True)
         context.update({
             'brands': page_obj.object_list,
             'page_obj': page_obj,
@@ -133,7 +157,7 @@ def category(request):
             
         categories = Category.objects.all().order_by('name')
         page_number = request.GET.get('page')
-        page_obj, paginator_list = paginate_list(page_number, categories)
+        page_obj, paginator_list = paginate_list(page_number, categories, ordering=('name', 'id'), approximate_count=True)
         context.update({
             'categories': page_obj.object_list,
             'page_obj': page_obj,
@@ -146,8 +170,8 @@ def category(request):
 def product(request):
     context = {}
     is_add_page = request.path.endswith('add_product/')
-    brands = Brand.objects.filter(is_active=True).order_by('name')
-    categories = Category.objects.filter(is_active=True).order_by('name')
+    brands = cached_queryset(Brand.objects.filter(is_active=True).order_by('name'))
+    categories = cached_queryset(Category.objects.filter(is_active=True).order_by('name'))
     context.update({
         'brands': brands,
         'categories': categories,
@@ -209,7 +233,7 @@ def product(request):
             
         products = Product.objects.all().order_by('name')
         page_number = request.GET.get('page')
-        page_obj, paginator_list = paginate_list(page_number, products)
+        page_obj, paginator_list = paginate_list(page_number, products, ordering=('name', 'id'), approximate_count=True)
         context.update({
             'products': page_obj.object_list,
             'page_obj': page_obj,
@@ -236,7 +260,7 @@ def add_product_category(request):
     context = {}
     is_add_page = request.path.endswith('add_product_category/')
     products = Product.objects.filter(is_active=True).order_by('name')
-    categories = Category.objects.filter(is_active=True).order_by('name')
+    categories = cached_queryset(Category.objects.filter(is_active=True).order_by('name'))
     context.update({
         'products': products,
         'categories': categories,
@@ -268,7 +292,10 @@ def product_category(request):
     if request.method == 'GET':      
         product_categories = ProductCategory.objects.select_related('product', 'category').order_by('product__name', 'category__name')
         page_number = request.GET.get('page')
-        page_obj, paginator_list = paginate_list(page_number, product_categories)
+        page_obj, paginator_list = paginate_list(
+            page_number, product_categories, ordering=('product__name', 'category__name', 'id'),
+            approximate_count=True,
+        )
         context.update({
             'product_categories': page_obj.object_list,
             'page_obj': page_obj,
@@ -302,7 +329,10 @@ def add_product_image(request):
 def product_image_list(request):
     product_images = ProductImage.objects.select_related('product').order_by('product__name', 'position')
     page_number = request.GET.get('page')
-    page_obj, paginator_list = paginate_list(page_number, product_images)
+    page_obj, paginator_list = paginate_list(
+        page_number, product_images, ordering=('product__name', 'position', 'id'),
+        approximate_count=True,
+    )
     context = {
             'product_images': page_obj.object_list,
             'page_obj': page_obj,
@@ -315,7 +345,7 @@ def product_image_list(request):
 def inventory_list(request):
     inventory_list = Inventory.objects.select_related('product').order_by('product__name')
     page_number = request.GET.get('page')
-    page_obj, paginator_list = paginate_list(page_number, inventory_list)
+    page_obj, paginator_list = paginate_list(page_number, inventory_list, ordering=('product__name', 'id'), approximate_count=True)
     context = {
             'inventory_list': page_obj.object_list,
             'page_obj': page_obj,
@@ -351,16 +381,103 @@ def inventory_add(request):
     return render(request, 'backends/add_to_inventory.html', {'products': products})
 
 
+@conditional_on_queryset(Product.objects.all(), max_age=settings.CATALOG_JSON_MAX_AGE)
 def get_products_json(request):
     """Return products as JSON for dynamic dropdown updates"""
-    products = Product.objects.filter(is_active=True).order_by('name').values('id', 'name')
-    return JsonResponse(list(products), safe=False)
+    products = cached_queryset(Product.objects.filter(is_active=True).order_by('name').values('id', 'name'))
+    return JsonResponse(products, safe=False)
 
 
+@conditional_on_queryset(Category.objects.all(), max_age=settings.CATALOG_JSON_MAX_AGE)
 def get_categories_json(request):
     """Return categories as JSON for dynamic dropdown updates"""
-    categories = Category.objects.filter(is_active=True).order_by('name').values('id', 'name')
-    return JsonResponse(list(categories), safe=False)
+    categories = cached_queryset(Category.objects.filter(is_active=True).order_by('name').values('id', 'name'))
+    return JsonResponse(categories, safe=False)
+
+
+def export_products(request):
+    """Stream the catalog as NDJSON or a JSON array.
+
+    Query parameters: ``fields`` (comma separated, e.g. ``id,name,price,stock``),
+    ``format`` (``ndjson`` or ``json``) and ``active`` (``all`` to include
+    inactive products).
+    """
+    if not checkUserPermissions(request, 'can_view', '/backends/product-list/'):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    output_format = request.GET.get('format', 'ndjson')
+    if output_format not in ('ndjson', 'json'):
+        return JsonResponse({'error': 'Format must be ndjson or json.'}, status=400)
+
+    rows = export_rows(fields, active_only=request.GET.get('active') != 'all')
+    if output_format == 'json':
+        response = StreamingHttpResponse(stream_json_array(rows), content_type='application/json')
+        filename = 'products.json'
+    else:
+        response = StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+        filename = 'products.ndjson'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _search_from_request(request):
+    def int_param(name, default=None):
+        try:
+            return int(request.GET.get(name, ''))
+        except ValueError:
+            return default
+
+    return search_products(
+        request.GET.get('q', '').strip(),
+        brand_id=int_param('brand'),
+        category_id=int_param('category'),
+        price_band=request.GET.get('price') or None,
+        page=max(int_param('page', 1), 1),
+    )
+
+
+def search(request):
+    """Full-text product search page with brand, category and price facets"""
+    result = _search_from_request(request)
+    context = {
+        'result': result,
+        'query': result.query,
+        'products': result.products,
+        'facets': result.facets,
+        'selected_brand': request.GET.get('brand', ''),
+        'selected_category': request.GET.get('category', ''),
+        'selected_price': request.GET.get('price', ''),
+    }
+    return render(request, 'backends/search.html', context)
+
+
+def search_json(request):
+    """Return search results and facet counts as JSON"""
+    result = _search_from_request(request)
+    return JsonResponse({
+        'query': result.query,
+        'total': result.total,
+        'page': result.page,
+        'num_pages': result.num_pages,
+        'results': [
+            {
+                'id': product.id,
+                'name': product.name,
+                'slug': product.slug,
+                'price': float(product.price),
+                'brand': product.brand.name,
+                'category': product.category.name,
+                'image': product.product_image.url if product.product_image else None,
+            }
+            for product in result.products
+        ],
+        'facets': result.facets,
+    })
 
 
 def membership_list(request):
@@ -487,8 +604,15 @@ def Login(request):
         # Authenticate user
         user = authenticate(request, username=user_obj.username, password=password)
         if user is not None:
+            guest_lines = guest_cart.read(request)
             login(request, user)
-            return redirect('backends:dashboard')
+            response = redirect('backends:dashboard')
+            if guest_lines:
+                customer = Customer.objects.filter(customer=user).first()
+                if customer:
+                    guest_cart.merge_into_cart(customer, guest_lines)
+                    guest_cart.write(response, {})
+            return response
 
         messages.error(request, 'Invalid email, username, or password.')
         return render(request, 'backends/login.html')
@@ -656,33 +780,117 @@ def Logout(request):
     return redirect('backends:login')
 
 
-def cart_ammount_summary(request):
-    sub_total = 0
-    total_val = 0
-    total_discount = 0
-    grand_total = 0
+def cart_ammount_summary(request, quote=None):
+    """Cart totals for the logged-in customer from the stored cart figures.
+
+    ``quote`` is a ``pricing.Quote``; the customer's cart is quoted (one
+    query) when not given.
+    """
+    if quote is None:
+        quote = pricing.quote_summary(cart_summary(request.user))
+    return quote.summary()
+
+
+def _guest_add_to_cart(request):
+    """add_to_cart for anonymous visitors: the cart lives in a signed cookie."""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
 
-    if request.user.is_authenticated:
+    try:
+        product_id = int(request.POST.get('product_id', ''))
+        quantity = int(request.POST.get('quantity', 1))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid product or quantity value.'}, status=400)
+    if quantity < 1:
+        return JsonResponse({'status': 'error', 'message': 'Quantity must be at least 1.'}, status=400)
+
+    lines = guest_cart.read(request)
+    if product_id not in lines and len(lines) >= guest_cart.MAX_LINES:
+        return JsonResponse({'status': 'error', 'message': 'Your cart is full.'}, status=400)
+    requested = lines.get(product_id, 0) + quantity
+    lines[product_id] = requested
+    lines, guest_lines = guest_cart.load(lines)
+    line = next((line for line in guest_lines if line.id == product_id), None)
+    if line is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'This product is currently unavailable.'
+        }, status=400)
+    # Advisory only: carts claim nothing, stock.reserve_order does at checkout
+    if requested > line.product.avl_quantity:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Cannot add {quantity} more. Only {line.product.avl_quantity} items available in stock.'
+        }, status=400)
+
+    quote = pricing.quote_lines(guest_lines)
+    response = JsonResponse({
+        'status': 'success',
+        'message': f'{line.product.name} has been added to your cart.',
+        'cart_item_count': quote.item_count,
+        'total_items': quote.unit_count,
+        'ammount_summary': cart_ammount_summary(request, quote),
+        'item_price': float(line.product.price),
+        'product_name': line.product.name,
+        'quantity': line.quantity,
+        'guest': True,
+    })
+    guest_cart.write(response, lines)
+    return response
+
+
+def _guest_cart_items(request):
+    """cartItem for anonymous visitors; ``cart_item_id`` is the product id."""
+    lines = guest_cart.read(request)
+
+    if request.method == 'POST':
+        action = request.POST.get('action')
         try:
-            customer = Customer.objects.get(customer=request.user)
-            cart = Cart.objects.filter(customer=customer).first()
-            if cart:
-                cart_items = CartItem.objects.filter(cart=cart).select_related('product')
-                for item in cart_items:
-                    sub_total += float(item.product.price) * item.quantity
-        except Customer.DoesNotExist:
-            pass
-
-    grand_total = (sub_total + total_val) - total_discount
-    return {
-        'sub_total': float(sub_total),
-        'tax_amount': float(total_val),
-        'total_discount': float(total_discount),
-        'grand_total': float(grand_total)
+            product_id = int(request.POST.get('cart_item_id', ''))
+        except ValueError:
+            product_id = None
+        if product_id not in lines:
+            messages.error(request, 'Cart item not found.')
+        elif action == 'update':
+            try:
+                quantity = int(request.POST.get('quantity', ''))
+            except ValueError:
+                quantity = 0
+            if quantity < 1:
+                messages.error(request, 'Quantity must be at least 1.')
+            else:
+                lines[product_id] = quantity
+                messages.success(request, 'Cart item updated successfully.')
+        elif action == 'delete':
+            del lines[product_id]
+            messages.success(request, 'The item has been removed from your cart.')
+        else:
+            messages.error(request, 'Invalid action.')
+        # Quantities above stock are capped when the cart page is read again.
+        response = redirect('backends:cart_items')
+        guest_cart.write(response, lines)
+        return response
+
+    cleaned, guest_lines = guest_cart.load(lines)
+    quote = pricing.quote_lines(guest_lines)
+    context = {
+        **quote.context(),
+        'cart_item_count': quote.item_count,
+        'total_items': quote.unit_count,
+        'customer': None,
+        'guest': True,
     }
+    response = render(request, 'backends/cart_items.html', context)
+    if cleaned != lines:
+        guest_cart.write(response, cleaned)
+    return response
 
 
+@query_budget(11)
 def add_to_cart(request):
+    if not request.user.is_authenticated and guest_cart.enabled():
+        return _guest_add_to_cart(request)
+
     if not request.user.is_authenticated:
         return JsonResponse({
             'status': 'error',
@@ -734,8 +942,9 @@ def add_to_cart(request):
             # Get or create cart
             cart, cart_created = Cart.objects.get_or_create(customer=customer)
 
-            # Get or create cart item
-            cart_item, item_created = CartItem.objects.get_or_create(
+            # Get or create cart item; the product is joined so the cart
+            # totals signal does not have to look its price up again
+            cart_item, item_created = CartItem.objects.select_related('product').get_or_create(
                 cart=cart,
                 product=product,
                 defaults={'quantity': quantity}
@@ -745,7 +954,7 @@ def add_to_cart(request):
                 # Update quantity
                 cart_item.quantity += quantity
                 
-                # Check stock availability
+                # Advisory only: carts claim nothing, stock.reserve_order does at checkout
                 if cart_item.quantity > product.avl_quantity:
                     return JsonResponse({
                         'status': 'error',
@@ -755,15 +964,14 @@ def add_to_cart(request):
                 cart_item.save()
 
             # Get cart summary
-            ammount_summary = cart_ammount_summary(request)
-            cart_item_count = CartItem.objects.filter(cart=cart).count()
-            total_items = sum(item.quantity for item in CartItem.objects.filter(cart=cart))
+            quote = pricing.quote_summary(cart_summary(request.user))
+            ammount_summary = cart_ammount_summary(request, quote)
 
             response = {
                 'status': 'success',
                 'message': f'{product.name} has been added to your cart.',
-                'cart_item_count': cart_item_count,
-                'total_items': total_items,
+                'cart_item_count': quote.item_count,
+                'total_items': quote.unit_count,
                 'ammount_summary': ammount_summary,
                 'item_price': float(product.price),
                 'product_name': product.name,
@@ -790,6 +998,7 @@ def add_to_cart(request):
     }, status=405)
 
 
+@query_budget(7)
 def cartItem(request):
     """
     View to handle cart item operations:
@@ -797,11 +1006,13 @@ def cartItem(request):
     - POST: Update or delete cart items
     """
     if not request.user.is_authenticated:
+        if guest_cart.enabled():
+            return _guest_cart_items(request)
         messages.error(request, 'Please log in to view your cart.')
         return redirect('backends:login')
 
     try:
-        customer = Customer.objects.get(customer=request.user)
+        customer = Customer.objects.select_related('membership').get(customer=request.user)
     except Customer.DoesNotExist:
         messages.error(request, 'Customer profile not found.')
         return redirect('backends:login')
@@ -846,7 +1057,7 @@ def cartItem(request):
                 messages.error(request, 'Quantity must be at least 1.')
                 return redirect('backends:cart_items')
 
-            # Check stock availability
+            # Advisory only: carts claim nothing, stock.reserve_order does at checkout
             if quantity > cart_item.product.avl_quantity:
                 messages.error(request, f'Only {cart_item.product.avl_quantity} items available in stock.')
                 return redirect('backends:cart_items')
@@ -875,48 +1086,96 @@ def cartItem(request):
         'product__category'
     )
     
-    # Add subtotal to each item
-    items_with_subtotal = []
-    for item in cart_items:
-        item.subtotal = float(item.product.price) * item.quantity
-        items_with_subtotal.append(item)
-    
-    # Calculate totals
-    sub_total = sum(item.subtotal for item in items_with_subtotal)
-    
-    # Get customer discount from membership
-    discount_percentage = 0
-    if customer.membership:
-        discount_percentage = float(customer.membership.discount_percentage)
-    elif customer.points_discount_percentage:
-        discount_percentage = float(customer.points_discount_percentage)
-    
-    discount_amount = (sub_total * discount_percentage) / 100
-    tax_amount = (sub_total - discount_amount) * 0.1  # 10% tax
-    grand_total = sub_total - discount_amount + tax_amount
-    
-    cart_item_count = len(items_with_subtotal)
-    total_items = sum(item.quantity for item in items_with_subtotal)
+    # Price every line, the discount and tax in one pass
+    quote = pricing.quote_lines(cart_items, pricing.customer_discount(customer))
 
     context = {
-        'cart_items': items_with_subtotal,
-        'cart_item_count': cart_item_count,
-        'total_items': total_items,
-        'sub_total': sub_total,
-        'discount_percentage': discount_percentage,
-        'discount_amount': discount_amount,
-        'tax_amount': tax_amount,
-        'grand_total': grand_total,
+        **quote.context(),
+        'cart_item_count': quote.item_count,
+        'total_items': quote.unit_count,
         'customer': customer,
     }
 
     return render(request, 'backends/cart_items.html', context)
 
 
+@require_POST
+@query_budget(14)
+def cart_batch(request):
+    """
+    Apply several cart line edits in one request.
+
+    Body: ``{"operations": [{"op": "set" | "add" | "remove", "product_id": 1, "quantity": 2}, ...]}``.
+    Operations run in order and the batch is all or nothing: any invalid
+    operation or stock shortfall rejects it with a 400 listing every error.
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+        operations = carts.parse_operations(payload.get('operations') if isinstance(payload, dict) else None)
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': 'Request body must be JSON.'}, status=400)
+    except carts.CartOperationError as e:
+        return JsonResponse({'status': 'error', 'message': str(e), 'errors': e.errors}, status=400)
+
+    if not request.user.is_authenticated:
+        if not guest_cart.enabled():
+            return JsonResponse({
+                'status': 'error',
+                'message': 'User is not authenticated. Please log in to edit your cart.'
+            }, status=401)
+        lines = guest_cart.read(request)
+        changes = carts.plan_quantities(lines, operations)
+        try:
+            carts.check_stock(changes)
+        except carts.CartOperationError as e:
+            return JsonResponse({'status': 'error', 'message': str(e), 'errors': e.errors}, status=400)
+        lines.update(changes)
+        lines = {product_id: quantity for product_id, quantity in lines.items() if quantity > 0}
+        if len(lines) > guest_cart.MAX_LINES:
+            return JsonResponse({'status': 'error', 'message': 'Your cart is full.'}, status=400)
+        lines, guest_lines = guest_cart.load(lines)
+        quote = pricing.quote_lines(guest_lines)
+        response = JsonResponse({
+            'status': 'success',
+            'cart_item_count': quote.item_count,
+            'total_items': quote.unit_count,
+            'ammount_summary': cart_ammount_summary(request, quote),
+            'lines': {str(product_id): quantity for product_id, quantity in lines.items()},
+            'guest': True,
+        })
+        guest_cart.write(response, lines)
+        return response
+
+    cart = Cart.objects.filter(customer__customer=request.user).first()
+    if cart is None:
+        # First edit: create the cart, as add_to_cart does
+        customer = Customer.objects.filter(customer=request.user).first()
+        if not customer:
+            return JsonResponse({'status': 'error', 'message': 'Customer profile not found.'}, status=404)
+        cart, created = Cart.objects.get_or_create(customer=customer)
+    try:
+        carts.apply_operations(cart, operations)
+    except carts.CartOperationError as e:
+        return JsonResponse({'status': 'error', 'message': str(e), 'errors': e.errors}, status=400)
+
+    quote = pricing.quote_summary(cart_summary(request.user))
+    return JsonResponse({
+        'status': 'success',
+        'cart_item_count': quote.item_count,
+        'total_items': quote.unit_count,
+        'ammount_summary': cart_ammount_summary(request, quote),
+        'lines': {
+            str(product_id): quantity
+            for product_id, quantity in CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity')
+        },
+    })
+
+
 # Configure Stripe API Key
 stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', 'sk_test_your_key_here')
 
 
+@query_budget(22)
 def checkout(request):
     """
     Checkout view to display order summary and shipping details
@@ -926,7 +1185,7 @@ def checkout(request):
         return redirect('backends:login')
 
     try:
-        customer = Customer.objects.get(customer=request.user)
+        customer = Customer.objects.select_related('membership').get(customer=request.user)
     except Customer.DoesNotExist:
         messages.error(request, 'Customer profile not found.')
         return redirect('backends:login')
@@ -945,28 +1204,12 @@ def checkout(request):
         'product__category'
     )
 
-    if not cart_items.exists():
+    if not cart.item_count:
         messages.error(request, 'Your cart is empty.')
         return redirect('backends:cart_items')
 
-    # Calculate totals
-    items_with_subtotal = []
-    for item in cart_items:
-        item.subtotal = float(item.product.price) * item.quantity
-        items_with_subtotal.append(item)
-
-    sub_total = sum(item.subtotal for item in items_with_subtotal)
-
-    # Get customer discount
-    discount_percentage = 0
-    if customer.membership:
-        discount_percentage = float(customer.membership.discount_percentage)
-    elif customer.points_discount_percentage:
-        discount_percentage = float(customer.points_discount_percentage)
-
-    discount_amount = (sub_total * discount_percentage) / 100
-    tax_amount = (sub_total - discount_amount) * 0.1
-    grand_total = sub_total - discount_amount + tax_amount
+    # Calculate totals; the order is written with exactly these figures
+    quote = pricing.quote_lines(cart_items, pricing.customer_discount(customer))
 
     if request.method == 'POST':
         shipping_address = request.POST.get('shipping_address', '').strip()
@@ -982,6 +1225,13 @@ def checkout(request):
 
         try:
             with transaction.atomic():
+                # A checkout left unpaid earlier in this session gives its stock back
+                previous_order = Order.objects.filter(
+                    id=request.session.get('order_id'), customer=customer, status='pending',
+                ).first()
+                if previous_order:
+                    stock.release_order(previous_order)
+
                 # Create order
                 order = Order.objects.create(
                     customer=customer,
@@ -989,32 +1239,48 @@ def checkout(request):
                     billing_address=billing_address,
                     status='pending',
                     vat=Decimal('0.00'),
-                    tax=Decimal(str(tax_amount)),
+                    tax=quote.tax,
                     shipping_cost=Decimal('0.00'),
                     paid_amount=Decimal('0.00'),
-                    due_amount=Decimal(str(grand_total)),
+                    due_amount=quote.total,
                     coupon=Decimal('0.00'),
-                    total_amount=Decimal(str(grand_total)),
+                    total_amount=quote.total,
                 )
 
+                # Snapshot the lines; the cart is emptied once payment succeeds
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product=item.product,
+                        product_name=item.product.name,
+                        unit_price=item.product.price,
+                        quantity=item.quantity,
+                        line_total=item.subtotal,
+                    )
+                    for item in quote.lines
+                ])
+
+                # Hold the stock until payment or until the reservation expires
+                stock.reserve_order(order, [(item.product_id, item.quantity) for item in quote.lines])
+
                 # Store order ID in session for payment processing
                 request.session['order_id'] = order.id
-                request.session['order_total'] = float(grand_total)
+                request.session['order_total'] = float(quote.total)
 
                 messages.success(request, 'Order created successfully. Proceeding to payment.')
                 return redirect('backends:payment_process')
 
+        except stock.InsufficientStock as e:
+            item = next(item for item in quote.lines if item.product_id == e.product_id)
+            messages.error(request, f'Sorry, {item.product.name} no longer has {item.quantity} in stock.')
+            return redirect('backends:cart_items')
+
         except Exception as e:
             messages.error(request, f'Failed to create order: {str(e)}')
             return redirect('backends:checkout')
 
     context = {
-        'cart_items': items_with_subtotal,
-        'sub_total': sub_total,
-        'discount_percentage': discount_percentage,
-        'discount_amount': discount_amount,
-        'tax_amount': tax_amount,
-        'grand_total': grand_total,
+        **quote.context(),
         'customer': customer,
     }
 
@@ -1042,19 +1308,20 @@ def payment_process(request):
     if request.method == 'POST':
         try:
             # Create Stripe payment intent
-            amount_in_cents = int(float(order.total_amount) * 100)
+            amount_in_cents = pricing.to_cents(order.total_amount)
             
-            intent = stripe.PaymentIntent.create(
-                amount=amount_in_cents,
-                currency='usd',
-                description=f'Order {order.order_number} - {order.customer.name}',
-                receipt_email=order.customer.email,
-                metadata={
-                    'order_id': order.id,
-                    'order_number': order.order_number,
-                    'customer_id': order.customer.id,
-                }
-            )
+            with STRIPE_LATENCY.labels('payment_intent_create').time():
+                intent = stripe.PaymentIntent.create(
+                    amount=amount_in_cents,
+                    currency='usd',
+                    description=f'Order {order.order_number} - {order.customer.name}',
+                    receipt_email=order.customer.email,
+                    metadata={
+                        'order_id': order.id,
+                        'order_number': order.order_number,
+                        'customer_id': order.customer.id,
+                    }
+                )
 
             return JsonResponse({
                 'client_secret': intent.client_secret,
@@ -1099,7 +1366,8 @@ def payment_confirm(request):
 
             # Verify payment intent with Stripe
             try:
-                payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+                with STRIPE_LATENCY.labels('payment_intent_retrieve').time():
+                    payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
             except stripe.error.StripeError as e:
                 return JsonResponse({'error': f'Stripe error: {str(e)}'}, status=400)
 
@@ -1107,10 +1375,13 @@ def payment_confirm(request):
                 with transaction.atomic():
                     # Update order
                     order.status = 'processing'
-                    order.paid_amount = Decimal(str(payment_intent.amount / 100))
+                    order.paid_amount = pricing.from_cents(payment_intent.amount)
                     order.due_amount = Decimal('0.00')
                     order.save()
 
+                    # The units held at checkout are now sold
+                    stock.commit_order(order)
+
                     # Create payment record
                     try:
                         customer = order.customer
@@ -1120,7 +1391,7 @@ def payment_confirm(request):
                     OnlinePaymentRequest.objects.create(
                         order=order,
                         transaction_id=payment_intent_id,
-                        amount=Decimal(str(payment_intent.amount / 100)),
+                        amount=pricing.from_cents(payment_intent.amount),
                         payment_status='completed',
                         created_by=order.customer.customer,
                     )
@@ -1128,7 +1399,7 @@ def payment_confirm(request):
                     # Clear cart
                     try:
                         cart = Cart.objects.get(customer=order.customer)
-                        CartItem.objects.filter(cart=cart).delete()
+                        carts.clear_cart(cart.pk)
                     except:
                         pass
 
@@ -1170,17 +1441,16 @@ def order_confirmation(request, order_id):
         return redirect('backends:login')
 
     try:
-        order = Order.objects.get(id=order_id, customer__customer=request.user)
+        order = Order.objects.prefetch_related('items').get(id=order_id, customer__customer=request.user)
     except Order.DoesNotExist:
         messages.error(request, 'Order not found.')
         return redirect('backends:dashboard')
 
-    # Get order items from cart (before it was cleared)
-    # You might want to create an OrderItem model for this
     payment = OnlinePaymentRequest.objects.filter(order=order).first()
 
     context = {
         'order': order,
+        'order_items': order.items.all(),
         'payment': payment,
     }
 
@@ -1195,7 +1465,7 @@ def order_status(request, order_id):
         return JsonResponse({'error': 'Not authenticated'}, status=401)
 
     try:
-        order = Order.objects.get(id=order_id, customer__customer=request.user)
+        order = Order.objects.prefetch_related('items').get(id=order_id, customer__customer=request.user)
     except Order.DoesNotExist:
         return JsonResponse({'error': 'Order not found'}, status=404)
 
@@ -1209,9 +1479,110 @@ def order_status(request, order_id):
         'paid_amount': float(order.paid_amount),
         'due_amount': float(order.due_amount),
         'payment_status': payment.payment_status if payment else 'pending',
+        'items': [
+            {
+                'product_id': item.product_id,
+                'product_name': item.product_name,
+                'unit_price': float(item.unit_price),
+                'quantity': item.quantity,
+                'line_total': float(item.line_total),
+            }
+            for item in order.items.all()
+        ],
         'created_at': order.created_at.isoformat(),
         'updated_at': order.updated_at.isoformat(),
     })
+
+
+ORDER_HISTORY_ORDERING = ('-created_at', '-id')
+ORDER_HISTORY_PER_PAGE = 20
+
+
+def order_history_page(customer_id, page_token):
+    """
+    One cursor page of a customer's orders, newest first, with payments and items prefetched
+    """
+    # Filtering on customer_id walks orders_customer_recent_idx without joining customers.
+    orders = Order.objects.filter(customer_id=customer_id).only(
+        'id', 'order_number', 'status', 'total_amount', 'paid_amount', 'due_amount',
+        'created_at', 'updated_at',
+    ).prefetch_related(
+        Prefetch(
+            'onlinepaymentrequest_set',
+            queryset=OnlinePaymentRequest.objects.only('id', 'order_id', 'payment_status').order_by('-id'),
+            to_attr='payments',
+        ),
+        'items',
+    )
+    page_obj = paginate_keyset(page_token, orders, ORDER_HISTORY_ORDERING, ORDER_HISTORY_PER_PAGE)
+    for order in page_obj:
+        order.payment_status = order.payments[0].payment_status if order.payments else 'pending'
+    return page_obj
+
+
+@query_budget(8)
+def order_history(request):
+    """
+    Order history page for the logged-in customer
+    """
+    if not request.user.is_authenticated:
+        messages.error(request, 'Please log in to view your orders.')
+        return redirect('backends:login')
+
+    customer_id = Customer.objects.filter(customer=request.user).values_list('id', flat=True).first()
+    if customer_id is None:
+        messages.error(request, 'Customer profile not found.')
+        return redirect('backends:dashboard')
+
+    context = {
+        'page_obj': order_history_page(customer_id, request.GET.get('page')),
+    }
+
+    return render(request, 'backends/order_history.html', context)
+
+
+@query_budget(8)
+def order_history_json(request):
+    """
+    JSON endpoint for the order history; pass ``next``/``previous`` back as ``?page=``
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Not authenticated'}, status=401)
+
+    customer_id = Customer.objects.filter(customer=request.user).values_list('id', flat=True).first()
+    if customer_id is None:
+        return JsonResponse({'error': 'Customer profile not found'}, status=404)
+
+    page_obj = order_history_page(customer_id, request.GET.get('page'))
+
+    return JsonResponse({
+        'orders': [
+            {
+                'order_id': order.id,
+                'order_number': order.order_number,
+                'status': order.status,
+                'total_amount': float(order.total_amount),
+                'paid_amount': float(order.paid_amount),
+                'due_amount': float(order.due_amount),
+                'payment_status': order.payment_status,
+                'items': [
+                    {
+                        'product_id': item.product_id,
+                        'product_name': item.product_name,
+                        'unit_price': float(item.unit_price),
+                        'quantity': item.quantity,
+                        'line_total': float(item.line_total),
+                    }
+                    for item in order.items.all()
+                ],
+                'created_at': order.created_at.isoformat(),
+                'updated_at': order.updated_at.isoformat(),
+            }
+            for order in page_obj
+        ],
+        'next': page_obj.next_page_number(),
+        'previous': page_obj.previous_page_number(),
+    })
                   
 
                     
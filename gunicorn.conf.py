@@ -0,0 +1,20 @@
+import os
+import shutil
+import tempfile
+
+# Workers share Prometheus samples through memory-mapped files in this
+# directory; it must be set before any worker imports prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'luxeprestige-metrics'))
+
+
+def on_starting(server):
+    # Samples from a previous run would be summed into the new one.
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)